@@ -0,0 +1,55 @@
+"""order list keyset indexes
+
+Lists only ever read visible orders, so the indexes are partial.
+
+Revision ID: 9a3e5c21d7b4
+Revises: 4b76a2574c7e
+Create Date: 2026-10-18 10:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a3e5c21d7b4"
+down_revision: Union[str, None] = "4b76a2574c7e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_order_customer_id_updated_at_id",
+            "order",
+            ["customer_id", "updated_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("is_hidden = false"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_order_master_id_updated_at_id",
+            "order",
+            ["master_id", "updated_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("is_hidden = false"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_order_master_id_updated_at_id",
+            table_name="order",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_order_customer_id_updated_at_id",
+            table_name="order",
+            postgresql_concurrently=True,
+        )
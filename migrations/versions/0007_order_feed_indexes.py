@@ -0,0 +1,76 @@
+"""order feed indexes
+
+Revision ID: 2f6d8b0e4a19
+Revises: 9a3e5c21d7b4
+Create Date: 2026-10-18 11:03:27.904116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2f6d8b0e4a19"
+down_revision: Union[str, None] = "9a3e5c21d7b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_order_feed_address_id_updated_at_id",
+            "order",
+            ["address_id", "updated_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("is_hidden = false AND status = 'created'"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_address_region_city",
+            "address",
+            ["region", "city"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_message_chat_id_id",
+            "message",
+            ["chat_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f("ix_order_history_order_id"),
+            "order_history",
+            ["order_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f("ix_order_history_order_id"),
+            table_name="order_history",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_message_chat_id_id",
+            table_name="message",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_address_region_city",
+            table_name="address",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_order_feed_address_id_updated_at_id",
+            table_name="order",
+            postgresql_concurrently=True,
+        )
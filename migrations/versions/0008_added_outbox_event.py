@@ -0,0 +1,45 @@
+"""added outbox_event
+
+Revision ID: 7c4b19e2f05a
+Revises: 2f6d8b0e4a19
+Create Date: 2026-10-18 13:41:09.226715
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c4b19e2f05a"
+down_revision: Union[str, None] = "2f6d8b0e4a19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_event",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("published_at", sa.DateTime(), nullable=True),
+        sa.Column("consumed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_outbox_event_id"), "outbox_event", ["id"], unique=False)
+    op.create_index(
+        "ix_outbox_event_unpublished_id",
+        "outbox_event",
+        ["id"],
+        unique=False,
+        postgresql_where=sa.text("published_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_event_unpublished_id", table_name="outbox_event")
+    op.drop_index(op.f("ix_outbox_event_id"), table_name="outbox_event")
+    op.drop_table("outbox_event")
@@ -0,0 +1,39 @@
+"""master notification targets index
+
+Revision ID: d81f3a6c5e27
+Revises: 7c4b19e2f05a
+Create Date: 2026-10-18 14:20:53.671840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d81f3a6c5e27"
+down_revision: Union[str, None] = "7c4b19e2f05a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_master_address_id_tg_chat_id",
+            "master",
+            ["address_id", "tg_chat_id"],
+            unique=False,
+            postgresql_where=sa.text("tg_chat_id IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_master_address_id_tg_chat_id",
+            table_name="master",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str], Awaitable[None]]
+
+RECONNECT_DELAY_SECONDS = 1
+
+
+async def dispatch(handlers: List[Handler], data: str) -> None:
+    # one failing handler must not stop delivery to the others
+    for handler in handlers:
+        try:
+            await handler(data)
+        except Exception:
+            logger.exception("Backplane handler failed")
+
+
+class Backplane(ABC):
+    """Fan-out of messages between all api workers"""
+
+    @abstractmethod
+    async def publish(self, channel: str, data: str) -> None:
+        ...
+
+    @abstractmethod
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryBackplane(Backplane):
+    """Single process backplane, used for development and tests"""
+
+    def __init__(self) -> None:
+        self.__handlers: Dict[str, List[Handler]] = {}
+
+    async def publish(self, channel: str, data: str) -> None:
+        await dispatch(self.__handlers.get(channel, []), data)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self.__handlers.setdefault(channel, []).append(handler)
+
+
+class RedisBackplane(Backplane):
+    def __init__(self, url: str) -> None:
+        from redis import asyncio as aioredis
+
+        self.__redis = aioredis.from_url(url)
+        self.__pubsub = self.__redis.pubsub()
+        self.__handlers: Dict[str, List[Handler]] = {}
+        self.__reader: Optional[asyncio.Task] = None
+
+    async def publish(self, channel: str, data: str) -> None:
+        await self.__redis.publish(channel, data)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        if channel not in self.__handlers:
+            self.__handlers[channel] = []
+            await self.__pubsub.subscribe(channel)
+
+        self.__handlers[channel].append(handler)
+
+        if self.__reader is None:
+            self.__reader = asyncio.create_task(self.__read())
+
+    async def close(self) -> None:
+        if self.__reader is not None:
+            self.__reader.cancel()
+        await self.__pubsub.close()
+        await self.__redis.close()
+
+    async def __read(self) -> None:
+        resubscribe = False
+
+        while True:
+            try:
+                if resubscribe:
+                    await self.__pubsub.reset()
+                    await self.__pubsub.subscribe(*self.__handlers.keys())
+                    resubscribe = False
+
+                async for message in self.__pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+
+                    channel = message["channel"].decode()
+                    data = message["data"].decode()
+
+                    await dispatch(self.__handlers.get(channel, []), data)
+            except Exception:
+                logger.exception("Backplane connection lost, reconnecting")
+
+            resubscribe = True
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+
+def create_backplane() -> Backplane:
+    if settings.REDIS_URL is None:
+        return InMemoryBackplane()
+    else:
+        return RedisBackplane(url=settings.REDIS_URL)
+
+
+backplane = create_backplane()
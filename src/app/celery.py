@@ -1,8 +1,60 @@
 from celery import Celery
+from kombu import Queue
+
 from app.config import settings
 
+# database heavy fan-out and network bound sends are served by separate workers
+NOTIFY_FANOUT_QUEUE = "notify_fanout"
+TG_SEND_QUEUE = "tg_send"
+# the relay feeds every notification and live feed, a slow fan-out mustn't delay it
+OUTBOX_RELAY_QUEUE = "outbox_relay"
+
+OUTBOX_RELAY_INTERVAL_SECONDS = 1.0
+
 celery = Celery("app")
-celery.conf.update(broker_url=settings.CELERY_BROKER_URL)
+celery.conf.update(
+    broker_url=settings.CELERY_BROKER_URL,
+    task_default_queue="celery",
+    task_queues=(
+        Queue("celery"),
+        Queue(NOTIFY_FANOUT_QUEUE),
+        Queue(TG_SEND_QUEUE),
+        Queue(OUTBOX_RELAY_QUEUE),
+    ),
+    task_routes={
+        "order.tasks.tasks.relay_outbox_events": {"queue": OUTBOX_RELAY_QUEUE},
+        "order.tasks.tasks.schedule_tg_order_new_notify": {
+            "queue": NOTIFY_FANOUT_QUEUE
+        },
+        "order.tasks.tasks.schedule_tg_orders_new_notify": {
+            "queue": NOTIFY_FANOUT_QUEUE
+        },
+        "order.tasks.tasks.tg_flush_digests": {"queue": NOTIFY_FANOUT_QUEUE},
+        "order.tasks.tasks.tg_new_order_notify": {"queue": TG_SEND_QUEUE},
+        "order.tasks.tasks.tg_new_order_notify_chats": {"queue": TG_SEND_QUEUE},
+    },
+    # a long fan-out shouldn't hold prefetched tasks other processes could run
+    worker_prefetch_multiplier=1,
+    # task events feed flower metrics: per task (and so per queue) wait and runtime
+    worker_send_task_events=True,
+    task_send_sent_event=True,
+    beat_schedule={
+        "relay-outbox-events": {
+            "task": "order.tasks.tasks.relay_outbox_events",
+            "schedule": OUTBOX_RELAY_INTERVAL_SECONDS,
+            # runs left over while the relay worker was down are useless
+            "options": {"expires": 5 * OUTBOX_RELAY_INTERVAL_SECONDS},
+        },
+        "redeliver-outbox-events": {
+            "task": "order.tasks.tasks.redeliver_outbox_events",
+            "schedule": 300.0,
+        },
+        "purge-outbox-events": {
+            "task": "order.tasks.tasks.purge_outbox_events",
+            "schedule": 3600.0,
+        },
+    },
+)
 celery.autodiscover_tasks()
 
 from order.tasks.tasks import *
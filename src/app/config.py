@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -19,10 +21,24 @@ class Settings(BaseSettings):
     DB_PORT: str
 
     TELEGRAM_BOT_TOKEN: str
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    # bot api limit, shared by all send workers through redis when REDIS_URL
+    # is set, otherwise by the sending threads of one worker process
+    TELEGRAM_MESSAGES_PER_SECOND: float = 30
+    # public base url of the bot, long polling is used when not set
+    TELEGRAM_WEBHOOK_URL: Optional[str] = None
+    TELEGRAM_WEBHOOK_SECRET: Optional[str] = None
+    TELEGRAM_WEBHOOK_PORT: int = 8080
+    TELEGRAM_BOT_WORKERS: int = 8
+    # combine new orders for a master into one message per window, needs redis
+    TG_DIGEST_WINDOW_SECONDS: int = 0
     CLIENT_ORIGIN: str
 
     CELERY_BROKER_URL: str
 
+    # pub/sub between api workers, in-process delivery only when not set
+    REDIS_URL: Optional[str] = None
+
     class Config:
         env_file = "./.env"
 
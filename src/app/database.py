@@ -1,17 +1,63 @@
-from sqlalchemy import create_engine
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import and_, create_engine, insert, or_, tuple_
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.config import settings
 
 database_url = f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASS}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 
-engine = create_engine(database_url, pool_size=50, max_overflow=20, pool_pre_ping=True)
+# Sync handlers are executed in the anyio thread pool, so every worker thread
+# should be able to hold its own connection without waiting on the pool.
+DB_POOL_SIZE = 50
+DB_MAX_OVERFLOW = 20
+
+engine = create_engine(
+    database_url,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# rows of one multi-row insert, postgres takes at most 65535 bind parameters
+BULK_INSERT_ROWS = 1_000
+
+
+def insert_rows(db: Session, model, rows: List[dict]) -> None:
+    for start in range(0, len(rows), BULK_INSERT_ROWS):
+        db.execute(insert(model).values(rows[start : start + BULK_INSERT_ROWS]))
+
+
+def keys_in(columns: Sequence, keys: Sequence[Tuple]):
+    """`(columns) IN keys` where None matches NULL, unlike IS NOT DISTINCT FROM
+    the condition stays usable by a btree index on the columns"""
+    keys_by_nulls: Dict[Tuple[bool, ...], List[Tuple]] = {}
+
+    for key in keys:
+        nulls = tuple(value is None for value in key)
+        keys_by_nulls.setdefault(nulls, []).append(key)
+
+    conditions = []
+
+    for nulls, group in keys_by_nulls.items():
+        condition = [column.is_(None) for column, null in zip(columns, nulls) if null]
+        compared = [column for column, null in zip(columns, nulls) if not null]
+        values = [tuple(value for value in key if value is not None) for key in group]
+
+        if len(compared) == 1:
+            condition.append(compared[0].in_([value for value, in values]))
+        elif len(compared) > 1:
+            condition.append(tuple_(*compared).in_(values))
+
+        conditions.append(and_(*condition))
+
+    return or_(*conditions)
+
 
 # Dependency
 def get_db():
@@ -0,0 +1,22 @@
+from threading import Lock
+from typing import Optional
+
+from redis import Redis
+
+from app.config import settings
+
+
+_redis: Optional[Redis] = None
+_redis_lock = Lock()
+
+
+def get_redis() -> Redis:
+    """Redis connection pool of the current process, created lazily after fork"""
+    global _redis
+
+    with _redis_lock:
+        if _redis is None:
+            assert settings.REDIS_URL is not None, "REDIS_URL should be set"
+            _redis = Redis.from_url(settings.REDIS_URL)
+
+        return _redis
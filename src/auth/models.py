@@ -8,6 +8,7 @@ from sqlalchemy import (
     Float,
     DateTime,
     BigInteger,
+    Index,
 )
 from sqlalchemy.orm import relationship
 
@@ -93,6 +94,16 @@ class Master(Base):
 
     orders = relationship("Order", back_populates="master")
 
+    # masters reachable in telegram, looked up by address for new orders
+    __table_args__ = (
+        Index(
+            "ix_master_address_id_tg_chat_id",
+            address_id,
+            tg_chat_id,
+            postgresql_where=tg_chat_id.isnot(None),
+        ),
+    )
+
     def geo_location(self) -> Optional[order_schemas.Location]:
         if self.latitude is not None and self.longtitude is not None:
             return order_schemas.Location(
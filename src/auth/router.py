@@ -17,7 +17,7 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
 @router.post("/register/master/", response_model=schemas.Token)
-async def master_register(
+def master_register(
     user: schemas.CreateMaster,
     db: Session = Depends(get_db),
     access: JwtAccess = Depends(get_security_access),
@@ -28,7 +28,7 @@ async def master_register(
 
 
 @router.post("/register/customer/", response_model=schemas.Token)
-async def customer_register(
+def customer_register(
     user: schemas.CreateCustomer,
     db: Session = Depends(get_db),
     access: JwtAccess = Depends(get_security_access),
@@ -39,7 +39,7 @@ async def customer_register(
 
 
 @router.post("/login/master/", response_model=schemas.Token)
-async def master_login(
+def master_login(
     user: schemas.Login,
     db: Session = Depends(get_db),
     access: JwtAccess = Depends(get_security_access),
@@ -50,7 +50,7 @@ async def master_login(
 
 
 @router.post("/login/customer/", response_model=schemas.Token)
-async def customer_login(
+def customer_login(
     user: schemas.Login,
     db: Session = Depends(get_db),
     access: JwtAccess = Depends(get_security_access),
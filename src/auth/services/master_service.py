@@ -1,13 +1,21 @@
 from datetime import datetime
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from fastapi import HTTPException, status
 
 import auth.models as models
 import auth.schemas as schemas
+import order.schemas as order_schemas
 
 from .encryption_service import EncryptionService
+from .notification_targets import (
+    GeoMaster,
+    MastersGeoIndex,
+    invalidate_notification_targets,
+    masters_geo_index_cache,
+    region_chat_ids_cache,
+)
 
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -17,6 +25,9 @@ from core.errors import Error
 import core.models as core_models
 
 
+CITY_SCOPED_REGIONS = {"Московская область"}
+
+
 class MasterService:
     def __init__(self, db: Session) -> None:
         self.__db = db
@@ -95,6 +106,8 @@ class MasterService:
         self.__db.commit()
         self.__db.refresh(db_master)
 
+        invalidate_notification_targets()
+
         return db_master
 
     def update_chat_id(self, email: str, chat_id: int) -> bool:
@@ -106,24 +119,71 @@ class MasterService:
         master.tg_chat_id = chat_id
         self.__db.commit()
 
+        invalidate_notification_targets()
+
         return True
 
-    def all_masters_by_region(
-        self, region: str, city: str | None = None
-    ) -> List[models.Master]:
-        masters = []
-        if region == "Московская область":
-            masters = (
-                self.__db.query(models.Master)
-                .join(core_models.Address)
-                .filter_by(region=region, city=city)
-                .all()
+    def notifiable_chat_ids(
+        self,
+        region: str,
+        city: str | None = None,
+        location: order_schemas.Location | None = None,
+    ) -> List[int]:
+        # masters of these regions work only in their own city
+        if region not in CITY_SCOPED_REGIONS:
+            city = None
+
+        chat_ids = region_chat_ids_cache.get(
+            key=(region, city),
+            load=lambda: self.__load_chat_ids(region=region, city=city),
+        )
+
+        if location is None:
+            return list(chat_ids)
+
+        # masters with a location and trip radius get orders they can reach,
+        # the others are still matched by region
+        geo_index = self.masters_geo_index()
+        chat_ids = [
+            chat_id for chat_id in chat_ids if chat_id not in geo_index.chat_ids
+        ]
+        chat_ids.extend(
+            geo_index.covering(
+                latitude=location.latitude, longtitude=location.longtitude
             )
-        else:
-            masters = (
-                self.__db.query(models.Master)
-                .join(core_models.Address)
-                .filter_by(region=region)
-                .all()
+        )
+
+        return chat_ids
+
+    def masters_geo_index(self) -> MastersGeoIndex:
+        return masters_geo_index_cache.get(load=self.__load_geo_masters)
+
+    def __load_geo_masters(self) -> List[GeoMaster]:
+        return (
+            self.__db.query(models.Master)
+            .with_entities(
+                models.Master.tg_chat_id,
+                models.Master.latitude,
+                models.Master.longtitude,
+                models.Master.trip_radius,
             )
-        return masters
+            .filter(models.Master.tg_chat_id.isnot(None))
+            .filter(models.Master.latitude.isnot(None))
+            .filter(models.Master.longtitude.isnot(None))
+            .filter(models.Master.trip_radius.isnot(None))
+            .all()
+        )
+
+    def __load_chat_ids(self, region: str, city: str | None) -> Tuple[int, ...]:
+        query = (
+            self.__db.query(models.Master)
+            .with_entities(models.Master.tg_chat_id)
+            .join(core_models.Address)
+            .filter(models.Master.tg_chat_id.isnot(None))
+            .filter(core_models.Address.region == region)
+        )
+
+        if region in CITY_SCOPED_REGIONS:
+            query = query.filter(core_models.Address.city == city)
+
+        return tuple(chat_id for chat_id, in query.all())
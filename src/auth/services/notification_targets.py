@@ -0,0 +1,223 @@
+import logging
+import math
+import time
+
+from threading import Lock
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from redis import RedisError
+
+from app.config import settings
+from app.redis_client import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+
+# bumped by any process (api, bot) after a master change, the notification
+# workers reload their caches when it moves
+MASTERS_VERSION_KEY = "masters:version"
+
+
+def masters_version() -> Optional[int]:
+    """None without redis, caches are then refreshed by ttl only"""
+    if settings.REDIS_URL is None:
+        return None
+
+    try:
+        return int(get_redis().get(MASTERS_VERSION_KEY) or 0)
+    except RedisError:
+        return None
+
+
+def invalidate_notification_targets() -> None:
+    """Called after a committed master change"""
+    region_chat_ids_cache.invalidate()
+    masters_geo_index_cache.invalidate()
+
+    if settings.REDIS_URL is None:
+        return
+
+    # the change is committed already, other processes catch up by ttl
+    try:
+        get_redis().incr(MASTERS_VERSION_KEY)
+    except RedisError:
+        logger.warning("Masters version bump failed", exc_info=True)
+
+
+# (region, city) -> telegram chat ids of masters
+TargetKey = Tuple[str, Optional[str]]
+
+
+class RegionChatIdsCache:
+    """Notifiable chat ids by region shared by the notification tasks of a process.
+
+    An entry lives `ttl` seconds or until the masters version changes.
+    """
+
+    def __init__(self, ttl: float = 60) -> None:
+        self.__ttl = ttl
+        self.__chat_ids: Dict[
+            TargetKey, Tuple[float, Optional[int], Tuple[int, ...]]
+        ] = {}
+        self.__lock = Lock()
+
+    def get(
+        self, key: TargetKey, load: Callable[[], Tuple[int, ...]]
+    ) -> Tuple[int, ...]:
+        now = time.monotonic()
+        # read before loading, a change committed meanwhile moves it again
+        version = masters_version()
+
+        with self.__lock:
+            cached = self.__chat_ids.get(key)
+
+        if cached is not None and cached[0] > now and cached[1] == version:
+            return cached[2]
+
+        chat_ids = load()
+
+        with self.__lock:
+            self.__chat_ids[key] = (now + self.__ttl, version, chat_ids)
+
+        return chat_ids
+
+    def invalidate(self) -> None:
+        with self.__lock:
+            self.__chat_ids.clear()
+
+
+region_chat_ids_cache = RegionChatIdsCache()
+
+
+RADIUS_EARTH_KM = 6371
+# size of grid buckets in degrees, roughly 55 km of latitude
+GRID_CELL_DEGREES = 0.5
+# longtitude cells wrap around at the antimeridian, Chukotka spans both sides
+LONGTITUDE_CELLS = round(360 / GRID_CELL_DEGREES)
+
+# (chat_id, latitude, longtitude, trip_radius in km)
+GeoMaster = Tuple[int, float, float, float]
+
+
+class MastersGeoIndex:
+    """Grid of masters by location, answers which masters cover a point"""
+
+    def __init__(self, masters: List[GeoMaster]) -> None:
+        self.chat_ids: FrozenSet[int] = frozenset(master[0] for master in masters)
+
+        self.__chat_ids = np.array([m[0] for m in masters], dtype=np.int64)
+        self.__latitudes = np.radians(np.array([m[1] for m in masters], dtype=float))
+        self.__longtitudes = np.radians(
+            np.array([m[2] for m in masters], dtype=float)
+        )
+        self.__radiuses = np.array([m[3] for m in masters], dtype=float)
+        self.__max_radius = float(self.__radiuses.max()) if len(masters) else 0.0
+
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for index, (_, latitude, longtitude, _) in enumerate(masters):
+            cells.setdefault(self.__cell(latitude, longtitude), []).append(index)
+
+        self.__cells = {
+            cell: np.array(indexes, dtype=np.int64) for cell, indexes in cells.items()
+        }
+
+    @staticmethod
+    def __cell(latitude: float, longtitude: float) -> Tuple[int, int]:
+        return (
+            math.floor(latitude / GRID_CELL_DEGREES),
+            math.floor((longtitude + 180) / GRID_CELL_DEGREES) % LONGTITUDE_CELLS,
+        )
+
+    def __candidates(self, latitude: float, longtitude: float) -> np.ndarray:
+        # every cell a master covering the point could be located in
+        angle = min(self.__max_radius / RADIUS_EARTH_KM, math.pi)
+        span_latitude = math.degrees(angle)
+        # widest longtitude of the circle around the point, it is reached north
+        # or south of the point's latitude so angle / cos(latitude) falls short
+        sin_ratio = math.sin(angle) / max(math.cos(math.radians(latitude)), 1e-9)
+        if angle < math.pi / 2 and sin_ratio < 1:
+            span_longtitude = math.degrees(math.asin(sin_ratio))
+        else:
+            span_longtitude = 180
+
+        min_lat = math.floor((latitude - span_latitude) / GRID_CELL_DEGREES)
+        max_lat = math.floor((latitude + span_latitude) / GRID_CELL_DEGREES)
+        min_lon = math.floor((longtitude - span_longtitude + 180) / GRID_CELL_DEGREES)
+        max_lon = math.floor((longtitude + span_longtitude + 180) / GRID_CELL_DEGREES)
+
+        if max_lon - min_lon + 1 >= LONGTITUDE_CELLS:
+            cell_lons = range(LONGTITUDE_CELLS)
+        else:
+            cell_lons = [
+                cell_lon % LONGTITUDE_CELLS for cell_lon in range(min_lon, max_lon + 1)
+            ]
+
+        indexes = [
+            self.__cells[(cell_lat, cell_lon)]
+            for cell_lat in range(min_lat, max_lat + 1)
+            for cell_lon in cell_lons
+            if (cell_lat, cell_lon) in self.__cells
+        ]
+
+        if len(indexes) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        return np.concatenate(indexes)
+
+    def covering(self, latitude: float, longtitude: float) -> List[int]:
+        """Chat ids of masters whose trip radius reaches the point"""
+        indexes = self.__candidates(latitude, longtitude)
+
+        if len(indexes) == 0:
+            return []
+
+        # vectorized haversine distance from every candidate to the point
+        to_latitude = math.radians(latitude)
+        to_longtitude = math.radians(longtitude)
+        latitudes = self.__latitudes[indexes]
+
+        a = (
+            np.sin((to_latitude - latitudes) / 2) ** 2
+            + np.cos(latitudes)
+            * math.cos(to_latitude)
+            * np.sin((to_longtitude - self.__longtitudes[indexes]) / 2) ** 2
+        )
+        distances = 2 * RADIUS_EARTH_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+        is_covered = distances <= self.__radiuses[indexes]
+
+        return self.__chat_ids[indexes[is_covered]].tolist()
+
+
+class MastersGeoIndexCache:
+    def __init__(self, ttl: float = 60) -> None:
+        self.__ttl = ttl
+        self.__index: Optional[Tuple[float, Optional[int], MastersGeoIndex]] = None
+        self.__lock = Lock()
+
+    def get(self, load: Callable[[], List[GeoMaster]]) -> MastersGeoIndex:
+        now = time.monotonic()
+        version = masters_version()
+
+        with self.__lock:
+            cached = self.__index
+
+        if cached is not None and cached[0] > now and cached[1] == version:
+            return cached[2]
+
+        index = MastersGeoIndex(masters=load())
+
+        with self.__lock:
+            self.__index = (now + self.__ttl, version, index)
+
+        return index
+
+    def invalidate(self) -> None:
+        with self.__lock:
+            self.__index = None
+
+
+masters_geo_index_cache = MastersGeoIndexCache()
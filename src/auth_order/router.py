@@ -24,7 +24,7 @@ router = APIRouter(prefix="/auth/order", tags=["Auth"])
     response_model=OrderCreated,
     summary="Register customer with order",
 )
-async def customer_register_with_order(
+def customer_register_with_order(
     user: schemas.CreateCustomerWithOrder,
     db: Session = Depends(get_db),
     access: JwtAccess = Depends(get_security_access),
@@ -40,7 +40,7 @@ async def customer_register_with_order(
     response_model=OrderCreated,
     summary="Login customer with order",
 )
-async def customer_login_with_order(
+def customer_login_with_order(
     data: schemas.LoginCustomerWithOrder,
     db: Session = Depends(get_db),
     access: JwtAccess = Depends(get_security_access),
@@ -1,4 +1,10 @@
+import hmac
+
 import telebot
+import uvicorn
+
+from fastapi import FastAPI, Header, HTTPException, Request, status
+
 from app.config import settings
 
 from auth.services.master_service import MasterService
@@ -11,7 +17,36 @@ import chat.models
 
 from validate_email import validate_email
 
-bot = telebot.TeleBot(settings.TELEGRAM_BOT_TOKEN, parse_mode=None)
+telebot.apihelper.API_URL = f"{settings.TELEGRAM_API_URL}/bot{{0}}/{{1}}"
+
+# handlers run on a bounded pool, so one slow registration doesn't block others
+bot = telebot.TeleBot(
+    settings.TELEGRAM_BOT_TOKEN,
+    parse_mode=None,
+    threaded=True,
+    num_threads=settings.TELEGRAM_BOT_WORKERS,
+)
+
+webhook_app = FastAPI()
+
+
+@webhook_app.post("/telegram/webhook")
+async def telegram_webhook(
+    request: Request,
+    secret_token: str | None = Header(None, alias="X-Telegram-Bot-Api-Secret-Token"),
+):
+    expected = settings.TELEGRAM_WEBHOOK_SECRET
+
+    if (
+        expected is None
+        or secret_token is None
+        or not hmac.compare_digest(secret_token.encode(), expected.encode())
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    update = telebot.types.Update.de_json(await request.json())
+    # only queues the update on the handler pool
+    bot.process_new_updates([update])
 
 
 @bot.message_handler(commands=["start"])
@@ -38,11 +73,11 @@ def get_text_messages(message):
         chat_id = message.chat.id
 
         db = SessionLocal()
-
-        service = MasterService(db=db)
-        is_updated_chat_id = service.update_chat_id(email=email, chat_id=chat_id)
-
-        db.close()
+        try:
+            service = MasterService(db=db)
+            is_updated_chat_id = service.update_chat_id(email=email, chat_id=chat_id)
+        finally:
+            db.close()
 
         if is_updated_chat_id:
             bot.reply_to(
@@ -64,4 +99,17 @@ def get_text_messages(message):
         )
 
 
-bot.infinity_polling()
+if __name__ == "__main__":
+    if settings.TELEGRAM_WEBHOOK_URL is None:
+        bot.remove_webhook()
+        bot.infinity_polling()
+    else:
+        # without a secret anyone who finds the url could post updates
+        if settings.TELEGRAM_WEBHOOK_SECRET is None:
+            raise RuntimeError("TELEGRAM_WEBHOOK_SECRET is required in webhook mode")
+
+        bot.set_webhook(
+            url=f"{settings.TELEGRAM_WEBHOOK_URL}/telegram/webhook",
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+        )
+        uvicorn.run(webhook_app, host="0.0.0.0", port=settings.TELEGRAM_WEBHOOK_PORT)
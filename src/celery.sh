@@ -2,6 +2,14 @@
 
 if [[ "${1}" == "celery" ]]; then
   celery -A app worker #--loglevel=info
+elif [[ "${1}" == "celery-fanout" ]]; then
+  celery -A app worker -Q notify_fanout,celery --pool prefork --concurrency 4 --prefetch-multiplier 1 -n fanout@%h
+elif [[ "${1}" == "celery-send" ]]; then
+  celery -A app worker -Q tg_send --pool threads --concurrency 32 --prefetch-multiplier 4 -n send@%h
+elif [[ "${1}" == "celery-relay" ]]; then
+  celery -A app worker -Q outbox_relay --pool solo --prefetch-multiplier 1 -n relay@%h
+elif [[ "${1}" == "beat" ]]; then
+  celery -A app beat
 elif [[ "${1}" == "flower" ]]; then
   celery -A app flower
  fi
\ No newline at end of file
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Optional, Tuple
+
+from prometheus_client import Counter
+
+
+# (master_id, customer_id)
+ChatMembers = Tuple[int, int]
+
+chat_members_cache_hits = Counter(
+    "chat_members_cache_hits_total", "Chat membership lookups served from memory"
+)
+chat_members_cache_misses = Counter(
+    "chat_members_cache_misses_total", "Chat membership lookups read from database"
+)
+
+
+class ChatMembersCache:
+    """Bounded LRU of chat members, chat membership never changes once created"""
+
+    def __init__(self, max_size: int = 10_000) -> None:
+        self.__max_size = max_size
+        self.__members: OrderedDict[int, ChatMembers] = OrderedDict()
+        self.__lock = Lock()
+
+    def get(
+        self, chat_id: int, load: Callable[[int], Optional[ChatMembers]]
+    ) -> Optional[ChatMembers]:
+        with self.__lock:
+            members = self.__members.get(chat_id)
+            if members is not None:
+                self.__members.move_to_end(chat_id)
+                chat_members_cache_hits.inc()
+                return members
+
+        chat_members_cache_misses.inc()
+        members = load(chat_id)
+
+        if members is not None:
+            self.put(chat_id=chat_id, members=members)
+
+        return members
+
+    def put(self, chat_id: int, members: ChatMembers) -> None:
+        with self.__lock:
+            self.__members[chat_id] = members
+            self.__members.move_to_end(chat_id)
+
+            while len(self.__members) > self.__max_size:
+                self.__members.popitem(last=False)
+
+    def contains(self, chat_id: int) -> bool:
+        with self.__lock:
+            return chat_id in self.__members
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -35,3 +35,5 @@ class Message(Base):
     to_user_id = Column(Integer, nullable=False)
 
     created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("ix_message_chat_id_id", chat_id, id),)
@@ -1,6 +1,7 @@
-from typing import List, Self
+from datetime import datetime
+from typing import List, Optional, Self, Tuple
 
-from sqlalchemy.orm import Session, load_only
+from sqlalchemy.orm import Session
 
 import chat.models as models
 import chat.schemas as schemas
@@ -8,6 +9,18 @@ import chat.schemas as schemas
 from order.queries import ChatIdByOrderIdQuery
 
 
+def to_message_schema(message: models.Message) -> schemas.Message:
+    return schemas.Message(
+        id=message.id,
+        text=message.text,
+        from_user_type=message.from_user_type,
+        from_user_id=message.from_user_id,
+        to_user_id=message.to_user_id,
+        chat_id=message.chat_id,
+        created_at=message.created_at,
+    )
+
+
 class AllMessagesByChatIdQuery:
     def __init__(self, db: Session):
         self.__db = db
@@ -17,14 +30,34 @@ class AllMessagesByChatIdQuery:
         return self.__messages
 
     def as_schemas(self) -> List[schemas.Message]:
-        return [schemas.Message(**m.__dict__) for m in self.__messages]
-
-    def __call__(self, chat_id: int) -> Self:
-        self.__messages = (
-            self.__db.query(models.Message)
-            .filter(models.Message.chat_id == chat_id)
-            .all()
+        return [to_message_schema(m) for m in self.__messages]
+
+    def __call__(
+        self,
+        chat_id: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> Self:
+        query = self.__db.query(models.Message).filter(
+            models.Message.chat_id == chat_id
         )
+
+        if after is not None:
+            query = query.filter(models.Message.id > after)
+
+        if since is not None:
+            query = query.filter(models.Message.created_at > since)
+
+        if before is not None:
+            # the page closest to the cursor, returned in chronological order
+            query = query.filter(models.Message.id < before)
+            messages = query.order_by(models.Message.id.desc()).limit(limit).all()
+            self.__messages = list(reversed(messages))
+        else:
+            self.__messages = query.order_by(models.Message.id).limit(limit).all()
+
         return self
 
 
@@ -37,31 +70,42 @@ class AllMessagesByOrderIdQuery:
         return self.__messages
 
     def as_schemas(self) -> List[schemas.Message]:
-        return [schemas.Message(**m.__dict__) for m in self.__messages]
-
-    def __call__(self, order_id: int) -> Self:
+        return [to_message_schema(m) for m in self.__messages]
+
+    def __call__(
+        self,
+        order_id: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> Self:
         chat_id = ChatIdByOrderIdQuery(db=self.__db)(order_id=order_id)
 
         if chat_id is None:
             return self
 
         all_messages_query = AllMessagesByChatIdQuery(db=self.__db)
-        self.__messages = all_messages_query(chat_id=chat_id).as_models()
+        self.__messages = all_messages_query(
+            chat_id=chat_id, before=before, after=after, since=since, limit=limit
+        ).as_models()
 
         return self
 
 
-class ChatContainsUserQuery:
-    def __init__(self, db: Session, chat_id: int):
+class ChatMembersQuery:
+    def __init__(self, db: Session):
         self.__db = db
-        self.__chat_id = chat_id
 
-    def __call__(self, user_id: int) -> bool:
-        chat: models.Chat = (
+    def __call__(self, chat_id: int) -> Optional[Tuple[int, int]]:
+        members = (
             self.__db.query(models.Chat)
-            .options(load_only(models.Chat.master_id, models.Chat.customer_id))
-            .filter(models.Chat.id == self.__chat_id)
+            .with_entities(models.Chat.master_id, models.Chat.customer_id)
+            .filter(models.Chat.id == chat_id)
             .first()
         )
-        members: [int] = [chat.master_id, chat.customer_id]
-        return user_id in members
+
+        if members is None:
+            return None
+
+        return members.master_id, members.customer_id
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, Query, WebSocket
 from fastapi.security import HTTPAuthorizationCredentials
 
@@ -7,23 +9,35 @@ from auth.dependency import get_credentials, get_security_access
 
 from app.database import get_db
 
+from app.backplane import backplane
 from chat.services import ChatService, UserConnectionsService
 
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-connections_service = UserConnectionsService()
+connections_service = UserConnectionsService(backplane=backplane)
 
 
 @router.get("/order/{order_id}/messages")
-async def get_all_messages(
+def get_all_messages(
     order_id: int,
     credentials: HTTPAuthorizationCredentials = get_credentials(),
     db: Session = Depends(get_db),
+    before: int | None = Query(None, description="Messages older than message id"),
+    after: int | None = Query(None, description="Messages newer than message id"),
+    since: datetime | None = Query(None, description="Messages created after"),
+    limit: int | None = Query(None, gt=0, le=500),
 ):
     user_id = credentials["id"]
     chat_service = ChatService(db=db)
-    return chat_service.get_all_messages(order_id=order_id, user_id=user_id)
+    return chat_service.get_all_messages(
+        order_id=order_id,
+        user_id=user_id,
+        before=before,
+        after=after,
+        since=since,
+        limit=limit,
+    )
 
 
 @router.websocket("/order/{order_id}")
@@ -31,7 +45,6 @@ async def websocket_endpoint(
     websocket: WebSocket,
     order_id: int,
     token: str = Query(...),
-    db: Session = Depends(get_db),
 ):
     brearer = get_security_access()
     params = brearer._decode(token=token)
@@ -40,8 +53,6 @@ async def websocket_endpoint(
     user_id = subject["id"]
     user_type = subject["user_type"]
 
-    connections_service.set_session(db=db)
-
     await connections_service.connect(
-        user_id=user_id, user_type=user_type, websocket=websocket
+        user_id=user_id, user_type=user_type, order_id=order_id, websocket=websocket
     )
@@ -6,6 +6,7 @@ import auth.schemas as auth_schemas
 
 
 class Message(CamelModel):
+    id: int | None = None
     text: str
     from_user_type: auth_schemas.UserType
     from_user_id: int
@@ -1,13 +1,20 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 from fastapi import HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
 from starlette.websockets import WebSocketState
 
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
 
+from app.database import SessionLocal
+
 import chat.models as models
 import chat.schemas as schemas
 import chat.queries as queries
+from app.backplane import Backplane
+from chat.cache import ChatMembers, ChatMembersCache
+from chat.writer import MessageWriter
 
 import auth.schemas as auth_schemas
 
@@ -43,40 +50,89 @@ class ChatService:
 
         return chat
 
-    def get_all_messages(self, order_id: int, user_id: int) -> List[schemas.Message]:
+    def get_all_messages(
+        self,
+        order_id: int,
+        user_id: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[schemas.Message]:
         user_has_access_to_order = order_queries.UserHasAccessToOrderQuery(db=self.__db)
 
         if not user_has_access_to_order(order_id=order_id, user_id=user_id):
             return []
 
         all_messages_query = queries.AllMessagesByOrderIdQuery(db=self.__db)
-        return all_messages_query(order_id=order_id).as_schemas()
-
-    def add_message(self, message: schemas.Message):
-        db_message = models.Message()
-        db_message.text = message.text
-        db_message.chat_id = message.chat_id
-        db_message.from_user_id = message.from_user_id
-        db_message.to_user_id = message.to_user_id
-        db_message.created_at = datetime.utcnow()
-        db_message.from_user_type = message.from_user_type
-
-        self.__db.add(db_message)
+        return all_messages_query(
+            order_id=order_id, before=before, after=after, since=since, limit=limit
+        ).as_schemas()
+
+    def add_messages(self, messages: List[schemas.Message]) -> List[int]:
+        if len(messages) == 0:
+            return []
+
+        # ids are taken upfront, RETURNING of a multi-row insert has no fixed order
+        ids = (
+            self.__db.execute(
+                select(
+                    func.nextval(func.pg_get_serial_sequence("message", "id"))
+                ).select_from(func.generate_series(1, len(messages)))
+            )
+            .scalars()
+            .all()
+        )
+        created_at = datetime.utcnow()
+
+        self.__db.execute(
+            insert(models.Message).values(
+                [
+                    {
+                        "id": id,
+                        "text": message.text,
+                        "chat_id": message.chat_id,
+                        "from_user_id": message.from_user_id,
+                        "to_user_id": message.to_user_id,
+                        "from_user_type": message.from_user_type,
+                        "created_at": created_at,
+                    }
+                    for id, message in zip(ids, messages)
+                ]
+            )
+        )
         self.__db.commit()
-        self.__db.refresh(db_message)
+
+        return ids
+
+
+CHAT_MESSAGES_CHANNEL = "chat:messages"
 
 
 class UserConnectionsService:
-    def __init__(self) -> None:
+    def __init__(self, backplane: Backplane) -> None:
         self.__master_connections: Dict[int, WebSocket] = {}
         self.__customer_connections: Dict[int, WebSocket] = {}
+        self.__backplane = backplane
+        self.__members_cache = ChatMembersCache()
+        self.__message_writer = MessageWriter()
 
-    def set_session(self, db: Session):
-        self.__db = db
+    async def start(self) -> None:
+        self.__message_writer.start()
+        await self.__backplane.subscribe(CHAT_MESSAGES_CHANNEL, self.deliver)
+
+    async def stop(self) -> None:
+        await self.__message_writer.stop()
 
     async def connect(
-        self, user_type: auth_schemas.UserType, user_id: int, websocket: WebSocket
+        self,
+        user_type: auth_schemas.UserType,
+        user_id: int,
+        order_id: int,
+        websocket: WebSocket,
     ) -> None:
+        await run_in_threadpool(self.warm_up, order_id)
+
         if user_type == auth_schemas.UserType.MASTER:
             self.__master_connections[user_id] = websocket
         else:
@@ -94,24 +150,67 @@ class UserConnectionsService:
         except WebSocketDisconnect:
             await self.disconnect(user_type=user_type, user_id=user_id)
 
+    def chat_members(self, chat_id: int) -> Optional[ChatMembers]:
+        return self.__members_cache.get(chat_id=chat_id, load=self.__load_members)
+
+    def warm_up(self, order_id: int) -> None:
+        db = SessionLocal()
+        try:
+            chat_id = order_queries.ChatIdByOrderIdQuery(db=db)(order_id=order_id)
+
+            if chat_id is None or self.__members_cache.contains(chat_id=chat_id):
+                return
+
+            if members := queries.ChatMembersQuery(db=db)(chat_id=chat_id):
+                self.__members_cache.put(chat_id=chat_id, members=members)
+        finally:
+            db.close()
+
+    def __load_members(self, chat_id: int) -> Optional[ChatMembers]:
+        db = SessionLocal()
+        try:
+            return queries.ChatMembersQuery(db=db)(chat_id=chat_id)
+        finally:
+            db.close()
+
+    def is_chat_member(self, message: schemas.Message) -> bool:
+        members = self.chat_members(chat_id=message.chat_id)
+
+        return members is not None and (
+            message.from_user_id in members and message.to_user_id in members
+        )
+
     async def send_message(self, message: schemas.Message):
-        chatContains = queries.ChatContainsUserQuery(
-            db=self.__db, chat_id=message.chat_id
+        if not await run_in_threadpool(self.is_chat_member, message):
+            return
+
+        # returns once the message is committed
+        await self.__message_writer.write(message=message)
+
+        # the recipient may be connected to any worker
+        await self.__backplane.publish(
+            CHAT_MESSAGES_CHANNEL, message.model_dump_json(by_alias=True)
         )
-        from_user_id = message.from_user_id
-        to_user_id = message.to_user_id
 
-        if chatContains(user_id=to_user_id) and chatContains(user_id=from_user_id):
-            if message.from_user_type == auth_schemas.UserType.CUSTOMER:
-                websocket = self.__master_connections.get(message.to_user_id)
-            else:
-                websocket = self.__customer_connections.get(message.to_user_id)
+    async def deliver(self, data: str):
+        message = schemas.Message.model_validate_json(data)
+
+        if message.from_user_type == auth_schemas.UserType.CUSTOMER:
+            connections = self.__master_connections
+        else:
+            connections = self.__customer_connections
+
+        websocket = connections.get(message.to_user_id)
 
-            chat_service = ChatService(db=self.__db)
-            chat_service.add_message(message=message)
+        if websocket is None:
+            return
 
-            if websocket is not None:
-                await websocket.send_text(message.model_dump_json(by_alias=True))
+        try:
+            await websocket.send_text(data)
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            # the socket is gone, e.g. uvicorn's ClientDisconnected
+            if connections.get(message.to_user_id) is websocket:
+                del connections[message.to_user_id]
 
     async def close(self, websocket: WebSocket):
         if websocket.client_state == WebSocketState.CONNECTED:
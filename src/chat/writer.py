@@ -0,0 +1,101 @@
+import asyncio
+
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+import chat.schemas as schemas
+
+from app.database import SessionLocal
+
+
+class MessageWriter:
+    """Buffers incoming messages and stores them with multi-row inserts.
+
+    `write` returns only after the batch with the message is committed, so a
+    message is never delivered or acknowledged before it is durable.
+    """
+
+    def __init__(self, max_batch_size: int = 200, flush_interval: float = 0.01):
+        self.__max_batch_size = max_batch_size
+        self.__flush_interval = flush_interval
+        self.__queue: asyncio.Queue[
+            Optional[Tuple[schemas.Message, asyncio.Future]]
+        ] = asyncio.Queue()
+        self.__task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is None:
+            return
+
+        await self.__queue.put(None)
+        await self.__task
+        self.__task = None
+
+    async def write(self, message: schemas.Message) -> None:
+        future = asyncio.get_running_loop().create_future()
+        await self.__queue.put((message, future))
+        await future
+
+    async def __run(self) -> None:
+        loop = asyncio.get_running_loop()
+        is_stopped = False
+
+        while not is_stopped:
+            item = await self.__queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.__flush_interval
+
+            while len(batch) < self.__max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+
+                try:
+                    item = await asyncio.wait_for(self.__queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+                if item is None:
+                    is_stopped = True
+                    break
+
+                batch.append(item)
+
+            await self.__flush(batch)
+
+    async def __flush(self, batch: List[Tuple[schemas.Message, asyncio.Future]]):
+        messages = [message for message, _ in batch]
+
+        try:
+            await run_in_threadpool(self.__insert, messages)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def __insert(self, messages: List[schemas.Message]) -> None:
+        from chat.services import ChatService
+
+        db = SessionLocal()
+        try:
+            ids = ChatService(db=db).add_messages(messages=messages)
+
+            # recipients use message ids as history cursors
+            for message, id in zip(messages, ids):
+                message.id = id
+        except:
+            db.rollback()
+            raise
+        finally:
+            db.close()
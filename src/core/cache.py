@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Generic, Hashable, Iterable, Set, TypeVar
+
+from prometheus_client import Counter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+K = TypeVar("K", bound=Hashable)
+
+# ids learned by the current transaction, promoted once it commits
+PENDING_IDS_KEY = "reference_ids_pending"
+
+reference_ids_cache_hits = Counter(
+    "reference_ids_cache_hits_total",
+    "Catalog ids served from memory",
+    ["catalog"],
+)
+reference_ids_cache_misses = Counter(
+    "reference_ids_cache_misses_total",
+    "Catalog ids read from database",
+    ["catalog"],
+)
+
+
+class ReferenceIdsCache(Generic[K]):
+    """Bounded LRU of catalog ids by natural key.
+
+    Catalog rows are append-only, a key keeps its id forever and workers need no
+    invalidation. Ids are cached only after the transaction that saw them commits,
+    so an id of a rolled back insert never gets in.
+    """
+
+    def __init__(self, catalog: str, max_size: int = 10_000) -> None:
+        self.__max_size = max_size
+        self.__ids: OrderedDict[K, int] = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = reference_ids_cache_hits.labels(catalog=catalog)
+        self.__misses = reference_ids_cache_misses.labels(catalog=catalog)
+
+    def get_or_load(
+        self,
+        db: Session,
+        keys: Iterable[K],
+        load: Callable[[Set[K]], Dict[K, int]],
+    ) -> Dict[K, int]:
+        keys = set(keys)
+        ids: Dict[K, int] = {}
+
+        with self.__lock:
+            for key in keys:
+                id = self.__ids.get(key)
+                if id is not None:
+                    self.__ids.move_to_end(key)
+                    ids[key] = id
+
+        missing = keys - ids.keys()
+
+        self.__hits.inc(len(ids))
+        self.__misses.inc(len(missing))
+
+        if len(missing) > 0:
+            loaded = load(missing)
+            db.info.setdefault(PENDING_IDS_KEY, []).append((self, loaded))
+            ids.update(loaded)
+
+        return ids
+
+    def put(self, ids: Dict[K, int]) -> None:
+        with self.__lock:
+            for key, id in ids.items():
+                self.__ids[key] = id
+                self.__ids.move_to_end(key)
+
+            while len(self.__ids) > self.__max_size:
+                self.__ids.popitem(last=False)
+
+
+@event.listens_for(Session, "after_commit")
+def promote_reference_ids(session: Session) -> None:
+    for cache, ids in session.info.pop(PENDING_IDS_KEY, []):
+        cache.put(ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_reference_ids(session: Session) -> None:
+    session.info.pop(PENDING_IDS_KEY, None)
@@ -12,3 +12,5 @@ class Error(str, Enum):
     ACCESS_DENIED = "access_denied"
     VIN_ALREADY_EXISTS_IN_ORDER = "vin_already_exists_in_order"
     CANCEL_ORDER_NOT_ALLOWED = "cancel_order_not_allowed"
+    INVALID_CURSOR = "invalid_cursor"
+    LIVE_EVENTS_UNAVAILABLE = "live_events_unavailable"
@@ -1,4 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, UniqueConstraint
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    UniqueConstraint,
+    Index,
+    DateTime,
+    JSON,
+)
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -32,4 +41,31 @@ class Address(Base):
     # область
     region = Column(String, index=True, unique=False, nullable=True)
 
-    __table_args__ = (UniqueConstraint(city, region, address),)
+    __table_args__ = (
+        UniqueConstraint(city, region, address),
+        Index("ix_address_region_city", region, city),
+    )
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_event"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    name = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+
+    created_at = Column(DateTime, nullable=False)
+    # handed over to the broker by the relay
+    published_at = Column(DateTime, nullable=True)
+    # processed by the consumer, guards against duplicate deliveries, also set
+    # when redelivery is given up after the retention period
+    consumed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_outbox_event_unpublished_id",
+            id,
+            postgresql_where=published_at.is_(None),
+        ),
+    )
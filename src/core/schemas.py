@@ -1,3 +1,4 @@
+from enum import Enum
 from typing import Optional
 from pydantic import BaseModel
 from humps import camelize
@@ -13,3 +14,13 @@ class CamelModel(BaseModel):
 class Contact(CamelModel):
     name: str
     phone: str
+
+
+class OutboxEventName(str, Enum):
+    ORDER_CREATED = "order_created"
+    # cancelled by the customer and open for masters again
+    ORDER_REOPENED = "order_reopened"
+    ORDER_TAKEN = "order_taken"
+    ORDER_STATUS_CHANGED = "order_status_changed"
+    # one notification job for orders created in a batch
+    ORDERS_CREATED = "orders_created"
@@ -1,10 +1,22 @@
-from typing import Optional
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
+from app.database import keys_in
+
 import core.models as models
 
 import core.schemas as schemas
 
+from core.cache import ReferenceIdsCache
+
+
+# address, region, city
+AddressKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+address_ids_cache: ReferenceIdsCache[AddressKey] = ReferenceIdsCache("address")
+
 
 class ContactService:
     def __init__(self, db: Session) -> None:
@@ -24,11 +36,85 @@ class ContactService:
     def get_or_create_address(
         self, address: Optional[str], region: Optional[str], city: Optional[str]
     ) -> models.Address:
-        if db_address := (
-            self.__db.query(models.Address)
-            .filter_by(address=address, region=region, city=city)
-            .first()
-        ):
-            return db_address
-        else:
-            return models.Address(address=address, region=region, city=city)
+        return self.__db.get(
+            models.Address,
+            self.address_id(address=address, region=region, city=city),
+        )
+
+    def address_id(
+        self, address: Optional[str], region: Optional[str], city: Optional[str]
+    ) -> int:
+        key = (address, region, city)
+        return self.address_ids(keys=[key])[key]
+
+    def address_ids(self, keys: Iterable[AddressKey]) -> Dict[AddressKey, int]:
+        return address_ids_cache.get_or_load(
+            db=self.__db, keys=keys, load=self.__load_address_ids
+        )
+
+    def __load_address_ids(self, keys: Set[AddressKey]) -> Dict[AddressKey, int]:
+        columns = (models.Address.address, models.Address.region, models.Address.city)
+        query = select(*columns, models.Address.id).where(
+            keys_in(columns=columns, keys=list(keys))
+        )
+
+        ids = self.__address_ids_from(query)
+        missing = sorted(keys - ids.keys(), key=str)
+
+        if len(missing) > 0:
+            # NULL columns never conflict, a concurrent duplicate is harmless
+            statement = (
+                insert(models.Address)
+                .values(
+                    [
+                        {"address": address, "region": region, "city": city}
+                        for address, region, city in missing
+                    ]
+                )
+                .on_conflict_do_nothing()
+                .returning(*columns, models.Address.id)
+            )
+            ids.update(self.__address_ids_from(statement))
+
+            if len(ids) < len(keys):
+                # inserted by a concurrent transaction
+                ids.update(self.__address_ids_from(query))
+
+        return ids
+
+    def __address_ids_from(self, statement) -> Dict[AddressKey, int]:
+        return {
+            (address, region, city): id
+            for address, region, city, id in self.__db.execute(statement)
+        }
+
+    def contact_ids(self, contacts: Iterable[schemas.Contact]) -> Dict[str, int]:
+        """Ids of contacts by phone, unknown phones are created in bulk"""
+        names_by_phone = {contact.phone: contact.name for contact in contacts}
+
+        if len(names_by_phone) == 0:
+            return {}
+
+        query = select(models.Contact.phone, models.Contact.id).where(
+            models.Contact.phone.in_(names_by_phone.keys())
+        )
+
+        ids = dict(self.__db.execute(query).all())
+        missing = sorted(names_by_phone.keys() - ids.keys())
+
+        if len(missing) > 0:
+            statement = (
+                insert(models.Contact)
+                .values(
+                    [{"name": names_by_phone[phone], "phone": phone} for phone in missing]
+                )
+                .on_conflict_do_nothing(index_elements=[models.Contact.phone])
+                .returning(models.Contact.phone, models.Contact.id)
+            )
+            ids.update(self.__db.execute(statement).all())
+
+            if len(ids) < len(names_by_phone):
+                # inserted by a concurrent transaction
+                ids.update(self.__db.execute(query).all())
+
+        return ids
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.database import insert_rows
+
+import core.models as models
+import core.schemas as schemas
+
+
+# handled events are kept for a while to look into delivery issues
+OUTBOX_RETENTION = timedelta(days=1)
+# a published event not consumed by then lost its consumer, e.g. the fan-out
+# task ran out of retries, and is handed to the consumer again
+OUTBOX_REDELIVERY_TIMEOUT = timedelta(minutes=10)
+
+
+class OutboxService:
+    def __init__(self, db: Session) -> None:
+        self.__db = db
+
+    def add(self, name: schemas.OutboxEventName, payload: dict) -> models.OutboxEvent:
+        """Adds event to the current transaction, it is published after commit"""
+        event = models.OutboxEvent(
+            name=name, payload=payload, created_at=datetime.utcnow()
+        )
+        self.__db.add(event)
+
+        return event
+
+    def add_many(self, name: schemas.OutboxEventName, payloads: List[dict]) -> None:
+        """Adds events with one multi-row insert, it is published after commit"""
+        created_at = datetime.utcnow()
+        insert_rows(
+            db=self.__db,
+            model=models.OutboxEvent,
+            rows=[
+                {"name": name, "payload": payload, "created_at": created_at}
+                for payload in payloads
+            ],
+        )
+
+    def lock_unpublished(self, limit: int) -> List[models.OutboxEvent]:
+        return (
+            self.__db.query(models.OutboxEvent)
+            .filter(models.OutboxEvent.published_at.is_(None))
+            .order_by(models.OutboxEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+    def mark_published(self, events: List[models.OutboxEvent]) -> None:
+        published_at = datetime.utcnow()
+
+        for event in events:
+            event.published_at = published_at
+
+    def lock_unconsumed(self, event_id: int) -> bool:
+        """Locks the event till the end of the transaction, False when consumed"""
+        locked_id = self.__db.execute(
+            select(models.OutboxEvent.id)
+            .where(models.OutboxEvent.id == event_id)
+            .where(models.OutboxEvent.consumed_at.is_(None))
+            .with_for_update()
+        ).scalar()
+
+        return locked_id is not None
+
+    def mark_consumed(self, event_ids: List[int]) -> None:
+        if len(event_ids) == 0:
+            return
+
+        self.__db.execute(
+            update(models.OutboxEvent)
+            .where(models.OutboxEvent.id.in_(event_ids))
+            .values(consumed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    def lock_stale(self, limit: int) -> List[models.OutboxEvent]:
+        """Published events still not consumed after the redelivery timeout"""
+        now = datetime.utcnow()
+
+        return (
+            self.__db.query(models.OutboxEvent)
+            .filter(models.OutboxEvent.consumed_at.is_(None))
+            .filter(models.OutboxEvent.published_at < now - OUTBOX_REDELIVERY_TIMEOUT)
+            .filter(models.OutboxEvent.created_at >= now - OUTBOX_RETENTION)
+            .order_by(models.OutboxEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+    def abandon_stale(self) -> List[int]:
+        """Marks consumed the events redelivered for the whole retention period
+        without success, so they are purged in turn. Returns their ids.
+        """
+        now = datetime.utcnow()
+
+        return (
+            self.__db.execute(
+                update(models.OutboxEvent)
+                .where(models.OutboxEvent.consumed_at.is_(None))
+                .where(models.OutboxEvent.published_at.is_not(None))
+                .where(models.OutboxEvent.created_at < now - OUTBOX_RETENTION)
+                .values(consumed_at=now)
+                .returning(models.OutboxEvent.id)
+                .execution_options(synchronize_session=False)
+            )
+            .scalars()
+            .all()
+        )
+
+    def purge(self) -> int:
+        """Deletes handled events older than the retention period"""
+        result = self.__db.execute(
+            delete(models.OutboxEvent)
+            .where(models.OutboxEvent.published_at.is_not(None))
+            .where(
+                models.OutboxEvent.consumed_at < datetime.utcnow() - OUTBOX_RETENTION
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        return result.rowcount
@@ -0,0 +1,220 @@
+"""Local stand-in of the Telegram Bot API for fan-out benchmarks and the bot.
+
+Run it and point the workers and the bot to it:
+
+    python fake_telegram_api.py
+    TELEGRAM_API_URL=http://localhost:8081
+
+It applies the bot limits of Telegram (30 messages per second per bot, one
+per second per chat) and answers 429 with retry_after like the real API.
+GET /stats shows how many messages were accepted and rejected.
+
+Besides sendMessage it serves the calls the bot makes on startup
+(getMe, deleteWebhook, setWebhook, getUpdates). POST /updates injects an incoming
+message, e.g. {"chat_id": 1, "text": "/start"}, which is then returned by
+getUpdates or posted to the webhook when one is set.
+"""
+import asyncio
+import os
+import time
+
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+import httpx
+import uvicorn
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+MESSAGES_PER_SECOND = 30
+CHAT_MESSAGES_PER_SECOND = 1
+# a chat takes a short burst, e.g. the two welcome replies of the bot
+CHAT_BURST = 3
+# simulated round trip of the real api
+LATENCY_SECONDS = float(os.getenv("FAKE_TELEGRAM_LATENCY_MS", "50")) / 1000
+
+app = FastAPI()
+
+# limits as token buckets, like the real api they tolerate some jitter
+bucket = {"tokens": float(MESSAGES_PER_SECOND), "updated_at": time.monotonic()}
+chat_buckets: Dict[str, Dict[str, float]] = {}
+stats = {"accepted": 0, "rejected": 0, "updates": 0, "started_at": time.monotonic()}
+
+updates: List[Dict[str, Any]] = []
+has_updates = asyncio.Event()
+webhook: Dict[str, Optional[str]] = {"url": None, "secret_token": None}
+# getUpdates waits for an update at most this long whatever the bot asks
+MAX_POLLING_TIMEOUT_SECONDS = 10
+
+
+async def get_params(request: Request) -> Dict[str, str]:
+    """Telebot sends parameters in the query string, httpx in a form body"""
+    params = dict(request.query_params)
+
+    for key, values in parse_qs((await request.body()).decode()).items():
+        params[key] = values[0]
+
+    return params
+
+
+def refill(bucket: Dict[str, float], rate: float, capacity: float, now: float):
+    bucket["tokens"] = min(
+        capacity, bucket["tokens"] + (now - bucket["updated_at"]) * rate
+    )
+    bucket["updated_at"] = now
+
+
+def ok(result: Any) -> Dict[str, Any]:
+    return {"ok": True, "result": result}
+
+
+def too_many_requests(retry_after: int) -> JSONResponse:
+    stats["rejected"] += 1
+
+    return JSONResponse(
+        status_code=429,
+        content={
+            "ok": False,
+            "error_code": 429,
+            "description": f"Too Many Requests: retry after {retry_after}",
+            "parameters": {"retry_after": retry_after},
+        },
+    )
+
+
+@app.post("/bot{token}/sendMessage")
+async def send_message(token: str, request: Request):
+    chat_id = (await get_params(request))["chat_id"]
+    now = time.monotonic()
+
+    chat_bucket = chat_buckets.setdefault(
+        chat_id, {"tokens": float(CHAT_BURST), "updated_at": now}
+    )
+
+    refill(bucket, MESSAGES_PER_SECOND, MESSAGES_PER_SECOND, now)
+    refill(chat_bucket, CHAT_MESSAGES_PER_SECOND, CHAT_BURST, now)
+
+    if bucket["tokens"] < 1 or chat_bucket["tokens"] < 1:
+        return too_many_requests(retry_after=1)
+
+    bucket["tokens"] -= 1
+    chat_bucket["tokens"] -= 1
+    stats["accepted"] += 1
+
+    await asyncio.sleep(LATENCY_SECONDS)
+
+    return ok(
+        {
+            "message_id": stats["accepted"],
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+        }
+    )
+
+
+@app.api_route("/bot{token}/getMe", methods=["GET", "POST"])
+async def get_me(token: str):
+    return ok(
+        {
+            "id": int(token.split(":")[0]),
+            "is_bot": True,
+            "first_name": "Fake",
+            "username": "fake_bot",
+        }
+    )
+
+
+@app.api_route("/bot{token}/setWebhook", methods=["GET", "POST"])
+async def set_webhook(token: str, request: Request):
+    params = await get_params(request)
+    # an empty url removes the webhook, telebot's remove_webhook sends that
+    webhook["url"] = params.get("url") or None
+    webhook["secret_token"] = params.get("secret_token")
+
+    return ok(True)
+
+
+@app.api_route("/bot{token}/deleteWebhook", methods=["GET", "POST"])
+async def delete_webhook(token: str):
+    webhook["url"] = None
+    webhook["secret_token"] = None
+
+    return ok(True)
+
+
+@app.api_route("/bot{token}/getUpdates", methods=["GET", "POST"])
+async def get_updates(token: str, request: Request):
+    if webhook["url"] is not None:
+        return JSONResponse(
+            status_code=409,
+            content={
+                "ok": False,
+                "error_code": 409,
+                "description": "Conflict: can't use getUpdates method while webhook is active",
+            },
+        )
+
+    params = await get_params(request)
+    offset = int(params.get("offset", 0))
+    timeout = min(float(params.get("timeout", 0)), MAX_POLLING_TIMEOUT_SECONDS)
+
+    # updates before the offset are confirmed by the bot
+    updates[:] = [update for update in updates if update["update_id"] >= offset]
+
+    if len(updates) == 0 and timeout > 0:
+        has_updates.clear()
+        try:
+            await asyncio.wait_for(has_updates.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    return ok(updates[: int(params.get("limit", 100))])
+
+
+@app.post("/updates")
+async def add_update(request: Request):
+    body = await request.json()
+    chat_id = int(body["chat_id"])
+    stats["updates"] += 1
+
+    update = {
+        "update_id": stats["updates"],
+        "message": {
+            "message_id": stats["updates"],
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Fake"},
+            "text": body["text"],
+        },
+    }
+
+    if webhook["url"] is None:
+        updates.append(update)
+        has_updates.set()
+    else:
+        headers = {}
+        if webhook["secret_token"] is not None:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = webhook["secret_token"]
+
+        async with httpx.AsyncClient() as client:
+            await client.post(webhook["url"], json=update, headers=headers)
+
+    return update
+
+
+@app.get("/stats")
+def get_stats():
+    elapsed = time.monotonic() - stats["started_at"]
+
+    return {
+        "accepted": stats["accepted"],
+        "rejected": stats["rejected"],
+        "updates": stats["updates"],
+        "accepted_per_second": stats["accepted"] / elapsed if elapsed > 0 else 0,
+    }
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("FAKE_TELEGRAM_PORT", "8081")))
@@ -1,15 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from anyio import to_thread
+
 from app.config import settings
+from app.backplane import backplane
+from app.database import DB_POOL_SIZE
+
+from order.constants import NEXT_CURSOR_HEADER
 
-from order.router import router as order_router
+from order.router import router as order_router, order_events_service
 
 from auth.router import router as auth_router
 
 from auth_order.router import router as auth_order_router
 
-from chat.router import router as chat_router
+from chat.router import router as chat_router, connections_service
 
 import sentry_sdk
 
@@ -31,6 +37,7 @@ app.add_middleware(
         "Access-Control-Allow-Origin",
         "Authorization",
     ],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(order_router)
@@ -41,7 +48,11 @@ app.include_router(chat_router)
 
 @app.on_event("startup")
 async def startup_event():
+    # Route handlers are sync and run in the thread pool, size it by db pool
+    to_thread.current_default_thread_limiter().total_tokens = DB_POOL_SIZE
     instrumentator.expose(app)
+    await connections_service.start()
+    await order_events_service.start()
     sentry_sdk.init(
         dsn=settings.SENTRY_DSN,
         # Set traces_sample_rate to 1.0 to capture 100%
@@ -49,3 +60,9 @@ async def startup_event():
         # We recommend adjusting this value in production,
         traces_sample_rate=1.0,
     )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await connections_service.stop()
+    await backplane.close()
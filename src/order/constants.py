@@ -1 +1,9 @@
 ORDER_PRICE_ONE_JOB_CATEGORY = 1_000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# recipients of one new order notification task
+TG_NOTIFY_CHUNK_SIZE = 50
+
+# orders accepted by one batch request
+ORDER_BATCH_MAX_SIZE = 1_000
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Dict, List, Optional
 
 from sqlalchemy import (
@@ -9,6 +10,7 @@ from sqlalchemy import (
     ForeignKey,
     DateTime,
     Float,
+    Index,
 )
 from sqlalchemy.orm import relationship
 
@@ -20,6 +22,11 @@ from order.constants import ORDER_PRICE_ONE_JOB_CATEGORY
 import auth.schemas as auth_schemas
 
 
+def make_order_number(id: int, created_at: datetime) -> str:
+    number = created_at.strftime("%Y%m%d")
+    return f"{id} - {number}"
+
+
 class Job(Base):
     __tablename__ = "job"
 
@@ -89,7 +96,7 @@ class OrderHistory(Base):
 
     id = Column(Integer, primary_key=True, index=True)
 
-    order_id = Column(Integer, ForeignKey("order.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("order.id"), nullable=False, index=True)
     master_id = Column(Integer, ForeignKey("master.id"), nullable=True, index=True)
     status = Column(String, unique=False, index=False, nullable=True)
     created_at = Column(DateTime, unique=False, index=False)
@@ -117,6 +124,7 @@ class Order(Base):
 
     customer = relationship("Customer", back_populates="orders")
     master = relationship("Master", back_populates="orders")
+    customer_contact = relationship("Contact", foreign_keys=[customer_contact_id])
 
     job_links = relationship("JobLink", back_populates="order")
     transport_links = relationship("TransportLink", back_populates="order")
@@ -135,10 +143,36 @@ class Order(Base):
     chat_id = Column(Integer, ForeignKey("chat.id"), index=True, nullable=True)
     chat = relationship("Chat")
 
+    # keyset pagination of order lists by (updated_at, id)
+    __table_args__ = (
+        Index(
+            "ix_order_customer_id_updated_at_id",
+            customer_id,
+            updated_at,
+            id,
+            postgresql_where=is_hidden == False,
+        ),
+        Index(
+            "ix_order_master_id_updated_at_id",
+            master_id,
+            updated_at,
+            id,
+            postgresql_where=is_hidden == False,
+        ),
+        # master feed: visible orders waiting for a master
+        Index(
+            "ix_order_feed_address_id_updated_at_id",
+            address_id,
+            updated_at,
+            id,
+            postgresql_where=(is_hidden == False)
+            & (status == schemas.Status.CREATED.value),
+        ),
+    )
+
     @property
     def order_number(self) -> str:
-        number = self.created_at.strftime("%Y%m%d")
-        return f"{self.id} - {number}"
+        return make_order_number(id=self.id, created_at=self.created_at)
 
     def geo_location(self) -> Optional[schemas.Location]:
         if self.latitude is not None and self.longtitude is not None:
@@ -154,22 +188,6 @@ class Order(Base):
 
         return cost
 
-    def get_updates_for_reset_jobs(self) -> List[schemas.UpdateJob]:
-        trasports = self.get_transports()
-
-        for transport in trasports:
-            for job in transport.jobs:
-                job.tasks = []
-
-        updates: List[schemas.UpdateJob] = []
-
-        for transport in trasports:
-            updates.append(
-                schemas.UpdateJob(transport_id=transport.id, jobs=transport.jobs)
-            )
-
-        return updates
-
     def get_transports(self) -> List[schemas.Transport]:
         jobs_by_transport: Dict[int, List[int]] = {}
         tasks_by_job: Dict[int, List[schemas.Task]] = {}
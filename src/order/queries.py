@@ -1,8 +1,54 @@
-from sqlalchemy.orm import Session, load_only
+from typing import List, Self
+
+from sqlalchemy import JSON, func, literal_column, select
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, aliased, load_only, joinedload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
 
 import order.models as models
 import order.schemas as schemas
 
+import auth.models as auth_models
+import core.models as core_models
+
+
+def order_detail_options() -> List[LoaderOption]:
+    """Loader graph for everything `to_order` touches while rendering `schemas.Order`"""
+    return [
+        joinedload(models.Order.address),
+        joinedload(models.Order.customer).joinedload(auth_models.Customer.contact),
+        joinedload(models.Order.customer_contact),
+        joinedload(models.Order.master).joinedload(auth_models.Master.contact),
+        joinedload(models.Order.master).joinedload(auth_models.Master.account),
+        joinedload(models.Order.chat),
+        selectinload(models.Order.transport_links).joinedload(
+            models.TransportLink.transport
+        ),
+        selectinload(models.Order.job_links).joinedload(models.JobLink.job),
+        selectinload(models.Order.job_links).joinedload(models.JobLink.task),
+    ]
+
+
+class OrderDetailQuery:
+    def __init__(self, db: Session):
+        self.__db = db
+
+    def __call__(self, order_id: int, for_update: bool = False) -> models.Order | None:
+        query = (
+            self.__db.query(models.Order)
+            .options(*order_detail_options())
+            .filter(models.Order.id == order_id)
+            .populate_existing()
+        )
+
+        if for_update:
+            # lock only the order row, joined relations are on the nullable side
+            query = query.with_for_update(of=models.Order)
+
+        return query.first()
+
 
 class ChatIdByOrderIdQuery:
     def __init__(self, db: Session):
@@ -13,7 +59,7 @@ class ChatIdByOrderIdQuery:
             self.__db.query(models.Order)
             .with_entities(models.Order.chat_id)
             .filter(models.Order.id == order_id)
-            .first()[0]
+            .scalar()
         )
 
 
@@ -48,3 +94,136 @@ class UserHasAccessToOrderQuery:
             .first()
         )
         return order.master_id == user_id or order.customer_id == user_id
+
+
+def _json_array_agg(value: ColumnElement, order_by: ColumnElement) -> ColumnElement:
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(value, order_by)),
+        literal_column("'[]'::json"),
+        type_=JSON,
+    )
+
+
+def _transports_projection() -> ColumnElement:
+    """Correlated `json_agg` of the order transports with their jobs and tasks"""
+    task_link = aliased(models.JobLink)
+    tasks = (
+        select(
+            _json_array_agg(
+                func.json_build_object(
+                    "name", models.Task.name, "agreed", models.Task.agreed
+                ),
+                order_by=task_link.id,
+            )
+        )
+        .select_from(task_link)
+        .join(models.Task, models.Task.id == task_link.task_id)
+        .where(task_link.order_id == models.Order.id)
+        .where(task_link.transport_id == models.TransportLink.transport_id)
+        .where(task_link.job_id == models.Job.id)
+        .correlate(models.Order, models.TransportLink, models.Job)
+        .scalar_subquery()
+    )
+
+    job_link = aliased(models.JobLink)
+    job_ids = (
+        select(job_link.job_id)
+        .where(job_link.order_id == models.Order.id)
+        .where(job_link.transport_id == models.TransportLink.transport_id)
+        .correlate(models.Order, models.TransportLink)
+    )
+    jobs = (
+        select(
+            _json_array_agg(
+                func.json_build_object(
+                    "category_id", models.Job.category_id, "tasks", tasks
+                ),
+                order_by=models.Job.category_id,
+            )
+        )
+        .where(models.Job.id.in_(job_ids))
+        .correlate(models.Order, models.TransportLink)
+        .scalar_subquery()
+    )
+
+    return (
+        select(
+            _json_array_agg(
+                func.json_build_object(
+                    "model",
+                    models.Transport.model,
+                    "brand",
+                    models.Transport.brand,
+                    "type",
+                    models.Transport.type,
+                    "jobs",
+                    jobs,
+                ),
+                order_by=models.TransportLink.id,
+            )
+        )
+        .select_from(models.TransportLink)
+        .join(
+            models.Transport, models.Transport.id == models.TransportLink.transport_id
+        )
+        .where(models.TransportLink.order_id == models.Order.id)
+        .correlate(models.Order)
+        .scalar_subquery()
+    )
+
+
+def master_region_subquery(master_id: int) -> ColumnElement:
+    master_address = aliased(core_models.Address)
+    return (
+        select(master_address.region)
+        .join(auth_models.Master, auth_models.Master.address_id == master_address.id)
+        .where(auth_models.Master.id == master_id)
+        .scalar_subquery()
+    )
+
+
+class OrderListQuery:
+    """Reads list rows with one statement, bypassing the ORM identity map"""
+
+    def __init__(self, db: Session):
+        self.__db = db
+        self.__rows: List[Row] = []
+
+    def as_schemas(self) -> List[schemas.GetOrderList]:
+        return [
+            schemas.GetOrderList(
+                id=row.id,
+                status=row.status,
+                order_number=models.make_order_number(
+                    id=row.id, created_at=row.created_at
+                ),
+                transports=row.transports,
+                update_at=row.updated_at,
+                region=row.region,
+                city=row.city,
+            )
+            for row in self.__rows
+        ]
+
+    def __call__(self, *criteria: ColumnElement, offset: int, limit: int) -> Self:
+        statement = (
+            select(
+                models.Order.id,
+                models.Order.status,
+                models.Order.created_at,
+                models.Order.updated_at,
+                core_models.Address.region,
+                core_models.Address.city,
+                _transports_projection().label("transports"),
+            )
+            .join(
+                core_models.Address, models.Order.address_id == core_models.Address.id
+            )
+            .where(*criteria)
+            .order_by(models.Order.updated_at.desc(), models.Order.id.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+
+        self.__rows = self.__db.execute(statement).all()
+        return self
@@ -1,85 +1,211 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
 
 from order.services.order_service import OrderService, to_order
 from order.services.transport_service import TransportService
 import order.schemas as schemas
-
-from order.tasks.tasks import schedule_tg_order_new_notify
+import order.utils as utils
+from order.constants import NEXT_CURSOR_HEADER, ORDER_BATCH_MAX_SIZE
 
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.backplane import backplane
+from app.config import settings
+from app.database import SessionLocal, get_db
+
+from auth.dependency import get_credentials, get_security_access
+from auth.services.master_service import MasterService
+import auth.schemas as auth_schemas
 
-from auth.dependency import get_credentials
+from core.errors import Error
+
+from order.services.order_events import OrderEventsService
 from order.services.new_order_notifier import NewOrderNotifier
 
 
 router = APIRouter(prefix="/order", tags=["Order"])
 
+order_events_service = OrderEventsService(backplane=backplane)
+
 
 @router.post("/", response_model=schemas.OrderCreated)
-async def create_order(
+def create_order(
     order: schemas.PostOrder,
     credentials: HTTPAuthorizationCredentials = get_credentials(),
     db: Session = Depends(get_db),
 ):
     id: int = credentials["id"]
-    order = OrderService.create_order(order=order, customer_id=id, db=db)
-    schedule_tg_order_new_notify.delay(order.id)
+    order = OrderService.create_order(
+        order=order, customer_id=id, db=db, notify_masters=True
+    )
 
     return schemas.OrderCreated(order_number=order.order_number, order_id=order.id)
 
 
+@router.post("/batch", response_model=List[schemas.OrderCreated])
+def create_orders(
+    orders: List[schemas.PostOrder] = Body(
+        ..., min_length=1, max_length=ORDER_BATCH_MAX_SIZE
+    ),
+    credentials: HTTPAuthorizationCredentials = get_credentials(),
+    db: Session = Depends(get_db),
+):
+    if credentials["user_type"] != auth_schemas.UserType.CUSTOMER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=Error.NOT_ALLOW_OPERATION,
+        )
+
+    return OrderService.create_orders(
+        orders=orders, customer_id=credentials["id"], db=db, notify_masters=True
+    )
+
+
 @router.post("/anonymous", response_model=schemas.OrderCreated)
-async def create_order(
+def create_order(
     order: schemas.PostOrder,
     db: Session = Depends(get_db),
 ):
-    order = OrderService.create_order_without_register(order=order, db=db)
-    schedule_tg_order_new_notify.delay(order.id)
+    order = OrderService.create_order_without_register(
+        order=order, db=db, notify_masters=True
+    )
     return schemas.OrderCreated(order_number=order.order_number, order_id=order.id)
 
 
 @router.get("/my", response_model=List[schemas.GetOrderList])
-async def get_my_orders(
+def get_my_orders(
+    response: Response,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = get_credentials(),
     page: int = 0,
     limit: int = 20,
+    cursor: str | None = None,
 ):
     user_type = credentials["user_type"]
     user_id = credentials["id"]
     order_service = OrderService(db=db)
+    limit = min(20, limit)
 
-    return order_service.get_my_list(
-        user_id=user_id, user_type=user_type, offset=page, limit=min(20, limit)
+    orders = order_service.get_my_list(
+        user_id=user_id,
+        user_type=user_type,
+        offset=page if cursor is None else 0,
+        limit=limit,
+        cursor=cursor,
     )
 
+    if next_cursor := utils.next_cursor(orders=orders, limit=limit):
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return orders
+
 
 @router.get("/all", response_model=List[schemas.GetOrderList])
-async def get_all_orders(
+def get_all_orders(
+    response: Response,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = get_credentials(),
     page: int = 0,
     limit: int = 20,
+    cursor: str | None = None,
 ):
     user_type = credentials["user_type"]
     user_id = credentials["id"]
     order_service = OrderService(db=db)
+    limit = min(limit, 20)
 
-    return order_service.get_all_orders(
-        user_id=user_id, user_type=user_type, offset=page, limit=min(limit, 20)
+    orders = order_service.get_all_orders(
+        user_id=user_id,
+        user_type=user_type,
+        offset=page if cursor is None else 0,
+        limit=limit,
+        cursor=cursor,
+    )
+
+    if next_cursor := utils.next_cursor(orders=orders, limit=limit):
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return orders
+
+
+def require_live_events():
+    # events are produced by celery, without redis they never reach this process
+    if settings.REDIS_URL is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=Error.LIVE_EVENTS_UNAVAILABLE,
+        )
+
+
+@router.get(
+    "/feed",
+    response_class=StreamingResponse,
+    dependencies=[Depends(require_live_events)],
+    description="Server-sent events about orders of the master region",
+)
+async def order_feed(token: str = Query(...)):
+    # EventSource can't send headers, token is passed like for websockets
+    subject = get_security_access()._decode(token=token)["subject"]
+
+    if subject["user_type"] != auth_schemas.UserType.MASTER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=Error.NOT_ALLOW_OPERATION,
+        )
+
+    region = await run_in_threadpool(master_region, subject["id"])
+
+    return StreamingResponse(
+        order_events_service.region_feed(region=region),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/events",
+    response_class=StreamingResponse,
+    dependencies=[Depends(require_live_events)],
+    description="Server-sent status changes of the orders the user participates in",
+)
+async def order_events(token: str = Query(...)):
+    subject = get_security_access()._decode(token=token)["subject"]
+
+    return StreamingResponse(
+        order_events_service.user_stream(
+            user_type=subject["user_type"], user_id=subject["id"]
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+def master_region(master_id: int) -> str:
+    db = SessionLocal()
+    try:
+        master = MasterService(db=db).get_master_by_id(id=master_id)
+        return master.address.region
+    finally:
+        db.close()
+
+
 @router.post(
     "/{order_id}/transport/{transport_id}",
     response_model=schemas.Order,
 )
-async def set_extra_values(
+def set_extra_values(
     order_id: int,
     transport_id: int,
     extra_values: schemas.UpdateTransportExtraValues,
@@ -106,7 +232,7 @@ async def set_extra_values(
 
 
 @router.get("/{order_id}", response_model=schemas.Order)
-async def get_order(
+def get_order(
     order_id: int,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = get_credentials(),
@@ -120,7 +246,7 @@ async def get_order(
 
 
 @router.get("/{order_id}/anonymous", response_model=schemas.Order)
-async def get_order(
+def get_order(
     order_id: int,
     db: Session = Depends(get_db),
 ):
@@ -129,7 +255,7 @@ async def get_order(
 
 
 @router.put("/{order_id}/cancel", response_model=schemas.Order)
-async def cancel_order(
+def cancel_order(
     order_id: int,
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = get_credentials(),
@@ -148,7 +274,7 @@ async def cancel_order(
     response_model=schemas.Order,
     description="Update status for order_id",
 )
-async def set_status(
+def set_status(
     order_id: int,
     order: schemas.SetStatus,
     db: Session = Depends(get_db),
@@ -173,7 +299,7 @@ async def set_status(
     description="Update jobs for order_id",
     response_model=schemas.Order,
 )
-async def update_jobs(
+def update_jobs(
     order_id: int,
     transports: List[schemas.UpdateJob],
     credentials: HTTPAuthorizationCredentials = get_credentials(),
@@ -9,7 +9,7 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field
 
-from core.schemas import CamelModel, Contact
+from core.schemas import CamelModel, Contact, OutboxEventName
 
 import chat.schemas as chat_schemas
 
@@ -149,6 +149,19 @@ class GetOrderList(CamelModel):
     city: str | None = None
 
 
+class OrderEvent(CamelModel):
+    event: OutboxEventName
+    order_id: int
+    order_number: str
+    status: Status
+    updated_at: datetime
+    region: str | None = None
+    city: str | None = None
+    # participants the event is routed to, not sent to clients
+    customer_id: int | None = None
+    master_id: int | None = None
+
+
 class SetStatus(BaseModel):
     status: Status
 
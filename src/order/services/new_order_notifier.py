@@ -1,9 +1,17 @@
+from typing import Dict, List
+
 from sqlalchemy.orm import Session
 
 
 from auth.services.master_service import MasterService
+import auth.schemas as auth_schemas
 
 from app.config import settings
+from app.redis_client import get_redis
+
+import order.schemas as order_schemas
+from order.constants import TG_NOTIFY_CHUNK_SIZE
+from order.services.notification_digest import NotificationDigest
 
 
 class NewOrderNotifier:
@@ -11,29 +19,79 @@ class NewOrderNotifier:
         self.__db = db
 
     def notify(self, order_id: int):
-        from order.services.order_service import OrderService
-        from order.tasks.tasks import tg_new_order_notify
+        from order.services.order_service import OrderService, to_order
+        from order.tasks.tasks import tg_flush_digests, tg_new_order_notify_chats
 
-        order = OrderService(db=self.__db).anonymous_order_by_id(id=order_id)
+        db_order = OrderService(db=self.__db).order_detail_by(id=order_id)
 
-        if order is None:
+        # taken or cancelled before the notification went out
+        if db_order is None or db_order.status != order_schemas.Status.CREATED:
             return
 
+        order = to_order(
+            order=db_order, user_type=auth_schemas.UserType.CUSTOMER, db=self.__db
+        )
+
         master_service = MasterService(db=self.__db)
-        masters = master_service.all_masters_by_region(
-            region=order.region, city=order.city
+        chat_ids = master_service.notifiable_chat_ids(
+            region=order.region, city=order.city, location=db_order.geo_location()
         )
 
-        for master in masters:
-            brand = order.transports[0].brand
-            model = order.transports[0].model
-            error_text = ", ".join(order.transports[0].job_names())
-            city: str = f"({order.city})" if order.city is not None else ""
-            message = (
-                f"В регионе: {order.region} {city} доступна заявка № {order.order_number}\n"
-                f"Транспортое средство: {brand} {model if model is not None else ''}\n"
-                f"Неисправность: {error_text}\n"
-                f"{settings.CLIENT_ORIGIN}/master/order/{order.id}"
+        if len(chat_ids) == 0:
+            return
+
+        message = self.render_message(order=order)
+
+        if settings.TG_DIGEST_WINDOW_SECONDS > 0:
+            digest = NotificationDigest(
+                redis=get_redis(), window=settings.TG_DIGEST_WINDOW_SECONDS
+            )
+            # the first order of a window schedules the digest for that chat
+            chat_ids = digest.add(
+                chat_ids=chat_ids,
+                order_id=order.id,
+                message=message,
+                line=self.render_digest_line(order=order),
             )
 
-            tg_new_order_notify.delay(chat_id=master.tg_chat_id, message=message)
+        for start in range(0, len(chat_ids), TG_NOTIFY_CHUNK_SIZE):
+            chunk = chat_ids[start : start + TG_NOTIFY_CHUNK_SIZE]
+
+            if settings.TG_DIGEST_WINDOW_SECONDS > 0:
+                tg_flush_digests.apply_async(
+                    kwargs={"chat_ids": chunk},
+                    countdown=settings.TG_DIGEST_WINDOW_SECONDS,
+                )
+            else:
+                tg_new_order_notify_chats.delay(chat_ids=chunk, message=message)
+
+    @staticmethod
+    def render_message(order: order_schemas.Order) -> str:
+        brand = order.transports[0].brand
+        model = order.transports[0].model
+        error_text = ", ".join(order.transports[0].job_names())
+        city: str = f"({order.city})" if order.city is not None else ""
+        return (
+            f"В регионе: {order.region} {city} доступна заявка № {order.order_number}\n"
+            f"Транспортое средство: {brand} {model if model is not None else ''}\n"
+            f"Неисправность: {error_text}\n"
+            f"{settings.CLIENT_ORIGIN}/master/order/{order.id}"
+        )
+
+    @staticmethod
+    def render_digest_line(order: order_schemas.Order) -> str:
+        brand = order.transports[0].brand
+        model = order.transports[0].model
+        city: str = f" ({order.city})" if order.city is not None else ""
+        return (
+            f"№ {order.order_number}{city}: {brand} {model if model is not None else ''}\n"
+            f"{settings.CLIENT_ORIGIN}/master/order/{order.id}"
+        )
+
+    @staticmethod
+    def render_digest(notifications: List[Dict[str, str]]) -> str:
+        if len(notifications) == 1:
+            return notifications[0]["message"]
+
+        lines = "\n\n".join(n["line"] for n in notifications)
+        return f"В вашем регионе доступны новые заявки: {len(notifications)}\n\n{lines}"
@@ -0,0 +1,58 @@
+import json
+
+from typing import Dict, Iterable, List
+
+from redis import Redis
+
+
+class NotificationDigest:
+    """Collects new order notifications per telegram chat for one window.
+
+    Every order is stored once per chat, so a retried fan-out doesn't repeat
+    an order in the digest.
+    """
+
+    def __init__(self, redis: Redis, window: int) -> None:
+        self.__redis = redis
+        self.__window = window
+
+    @staticmethod
+    def __orders_key(chat_id: int) -> str:
+        return f"tg:digest:{chat_id}"
+
+    @staticmethod
+    def __window_key(chat_id: int) -> str:
+        return f"tg:digest:{chat_id}:window"
+
+    def add(
+        self, chat_ids: Iterable[int], order_id: int, message: str, line: str
+    ) -> List[int]:
+        """Buffers the order and returns chats for which a new window was opened"""
+        chat_ids = list(chat_ids)
+        notification = json.dumps({"message": message, "line": line})
+
+        pipeline = self.__redis.pipeline(transaction=False)
+        for chat_id in chat_ids:
+            pipeline.hsetnx(self.__orders_key(chat_id), order_id, notification)
+            # expires on its own if the flush never happens
+            pipeline.set(self.__window_key(chat_id), 1, nx=True, ex=self.__window * 10)
+        results = pipeline.execute()
+
+        return [
+            chat_id
+            for chat_id, is_opened in zip(chat_ids, results[1::2])
+            if is_opened
+        ]
+
+    def pop(self, chat_id: int) -> List[Dict[str, str]]:
+        """Takes buffered notifications in order of order id and closes the window"""
+        pipeline = self.__redis.pipeline(transaction=True)
+        pipeline.hgetall(self.__orders_key(chat_id))
+        pipeline.delete(self.__orders_key(chat_id))
+        pipeline.delete(self.__window_key(chat_id))
+        notifications = pipeline.execute()[0]
+
+        return [
+            json.loads(notifications[order_id])
+            for order_id in sorted(notifications, key=int)
+        ]
@@ -0,0 +1,159 @@
+import asyncio
+
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+import order.models as models
+import order.schemas as schemas
+
+import auth.schemas as auth_schemas
+
+from app.backplane import Backplane
+
+from core.schemas import OutboxEventName
+from core.services.outbox_service import OutboxService
+
+
+ORDER_EVENTS_CHANNEL = "order:events"
+
+# comment line keeping idle event streams open through proxies
+FEED_KEEPALIVE_SECONDS = 15
+
+
+# events shown in the region feed of masters
+REGION_FEED_EVENTS = {
+    OutboxEventName.ORDER_CREATED,
+    OutboxEventName.ORDER_REOPENED,
+    OutboxEventName.ORDER_TAKEN,
+}
+
+ROUTING_FIELDS = {"customer_id", "master_id"}
+
+
+def add_order_event(
+    db: Session,
+    name: OutboxEventName,
+    order: models.Order,
+    notify_masters: bool = False,
+    master_id: Optional[int] = None,
+) -> None:
+    """Adds the order event to the outbox of the current transaction.
+
+    `master_id` overrides the order master, e.g. the one who lost a cancelled order.
+    """
+    event = schemas.OrderEvent(
+        event=name,
+        order_id=order.id,
+        order_number=order.order_number,
+        status=order.status,
+        updated_at=order.updated_at,
+        region=order.address.region,
+        city=order.address.city,
+        customer_id=order.customer_id,
+        master_id=master_id if master_id is not None else order.master_id,
+    )
+    OutboxService(db=db).add(
+        name=name, payload=to_payload(event=event, notify_masters=notify_masters)
+    )
+
+
+def add_orders_created_events(
+    db: Session, events: List[schemas.OrderEvent], notify_masters: bool = False
+) -> None:
+    """Adds created events of a batch, masters are notified by one job"""
+    outbox_service = OutboxService(db=db)
+
+    outbox_service.add_many(
+        name=OutboxEventName.ORDER_CREATED,
+        payloads=[to_payload(event=event, notify_masters=False) for event in events],
+    )
+
+    if notify_masters:
+        outbox_service.add(
+            name=OutboxEventName.ORDERS_CREATED,
+            payload={"order_ids": [event.order_id for event in events]},
+        )
+
+
+def to_payload(event: schemas.OrderEvent, notify_masters: bool) -> dict:
+    payload = event.model_dump(mode="json")
+    payload["notify_masters"] = notify_masters
+
+    return payload
+
+
+def to_server_sent_event(event: schemas.OrderEvent) -> str:
+    data = event.model_dump_json(by_alias=True, exclude=ROUTING_FIELDS)
+    return f"event: {event.event}\ndata: {data}\n\n"
+
+
+class OrderEventsService:
+    """Streams order events published by the outbox relay to connected clients"""
+
+    def __init__(self, backplane: Backplane) -> None:
+        self.__backplane = backplane
+        self.__region_feeds: Dict[str, Set[asyncio.Queue]] = {}
+        self.__user_streams: Dict[Tuple[str, int], Set[asyncio.Queue]] = {}
+
+    async def start(self) -> None:
+        await self.__backplane.subscribe(ORDER_EVENTS_CHANNEL, self.dispatch)
+
+    async def dispatch(self, data: str) -> None:
+        try:
+            event = schemas.OrderEvent.model_validate_json(data)
+        except ValidationError:
+            return
+
+        if event.event in REGION_FEED_EVENTS and event.region is not None:
+            for queue in self.__region_feeds.get(event.region, set()):
+                self.__put(queue=queue, event=event)
+
+        if event.event == OutboxEventName.ORDER_STATUS_CHANGED:
+            participants = [
+                (auth_schemas.UserType.CUSTOMER, event.customer_id),
+                (auth_schemas.UserType.MASTER, event.master_id),
+            ]
+            for participant in participants:
+                for queue in self.__user_streams.get(participant, set()):
+                    self.__put(queue=queue, event=event)
+
+    @staticmethod
+    def __put(queue: asyncio.Queue, event: schemas.OrderEvent) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # the client stopped reading, it refetches the list on reconnect
+            pass
+
+    def region_feed(self, region: str) -> AsyncIterator[str]:
+        return self.__stream(streams=self.__region_feeds, key=region)
+
+    def user_stream(
+        self, user_type: auth_schemas.UserType, user_id: int
+    ) -> AsyncIterator[str]:
+        """Status changes of the orders the user participates in"""
+        return self.__stream(streams=self.__user_streams, key=(user_type, user_id))
+
+    async def __stream(
+        self, streams: Dict[Hashable, Set[asyncio.Queue]], key: Hashable
+    ) -> AsyncIterator[str]:
+        queue: asyncio.Queue[schemas.OrderEvent] = asyncio.Queue(maxsize=100)
+        streams.setdefault(key, set()).add(queue)
+
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield to_server_sent_event(event)
+        finally:
+            queues = streams[key]
+            queues.discard(queue)
+
+            if len(queues) == 0:
+                del streams[key]
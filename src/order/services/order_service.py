@@ -3,23 +3,28 @@ from typing import List, Optional
 
 from fastapi import HTTPException, status
 
+from sqlalchemy import func, insert, literal, select
 from sqlalchemy.orm import Session
 
 import order.schemas as schemas
 import order.models as models
 import order.utils as utils
+import order.queries as queries
 from order.services.transport_service import TransportService
 from order.constants import ORDER_PRICE_ONE_JOB_CATEGORY
 from order.services.transition_order_status import TrasitionOrderStatus
+from order.services.order_events import add_order_event, add_orders_created_events
+
+from app.database import insert_rows
 
 from core.errors import Error
 import core.models as core_models
 from core.services.contact_service import ContactService
+import core.schemas as core_schemas
 
 from auth.services.customer_service import CustomerService
 from auth.services.master_service import MasterService
 import auth.schemas as auth_schemas
-import auth.models as auth_models
 
 
 import chat.schemas as chat_schemas
@@ -61,9 +66,10 @@ def to_order(
                 name=order.customer.contact.name, phone=order.customer.contact.phone
             )
 
-        if order.customer_contact_id is not None:
-            contact = ContactService(db=db).get_by_id(id=order.customer_contact_id)
-            customer = schemas.Contact(name=contact.name, phone=contact.phone)
+        if order.customer_contact is not None:
+            customer = schemas.Contact(
+                name=order.customer_contact.name, phone=order.customer_contact.phone
+            )
 
         if order.master is not None:
             master = schemas.Contact(
@@ -124,7 +130,10 @@ class OrderService:
 
     @staticmethod
     def create_order(
-        order: schemas.PostOrder, customer_id: int, db: Session
+        order: schemas.PostOrder,
+        customer_id: int,
+        db: Session,
+        notify_masters: bool = False,
     ) -> models.Order:
         customer = CustomerService(db=db).get_customer_by_id(customer_id)
 
@@ -151,7 +160,7 @@ class OrderService:
             status=schemas.Status.CREATED,
             latitude=order.latitude,
             longtitude=order.longtitude,
-            address=ContactService(db=db).get_or_create_address(
+            address_id=ContactService(db=db).address_id(
                 address=order.address, region=order.region, city=order.city
             ),
             need_evacuator=order.need_evacuator,
@@ -165,13 +174,113 @@ class OrderService:
             transports=order.transports, order=new_order
         )
 
+        add_order_event(
+            db=db,
+            name=core_schemas.OutboxEventName.ORDER_CREATED,
+            order=new_order,
+            notify_masters=notify_masters,
+        )
+
         db.commit()
 
         return new_order
 
+    @staticmethod
+    def create_orders(
+        orders: List[schemas.PostOrder],
+        customer_id: int,
+        db: Session,
+        notify_masters: bool = False,
+    ) -> List[schemas.OrderCreated]:
+        """Creates the orders of a fleet in one transaction with multi-row inserts"""
+        customer = CustomerService(db=db).get_customer_by_id(customer_id)
+
+        if customer is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=Error.USER_NOT_EXISTS,
+            )
+
+        contact_service = ContactService(db=db)
+        driver_ids = contact_service.contact_ids(
+            contacts=[order.driver for order in orders if order.driver is not None]
+        )
+        address_ids = contact_service.address_ids(
+            keys=[(order.address, order.region, order.city) for order in orders]
+        )
+
+        # ids are taken upfront, RETURNING of a multi-row insert has no fixed order
+        order_ids = (
+            db.execute(
+                select(
+                    func.nextval(func.pg_get_serial_sequence('"order"', "id"))
+                ).select_from(func.generate_series(1, len(orders)))
+            )
+            .scalars()
+            .all()
+        )
+        created_at = datetime.utcnow()
+
+        rows = []
+        events: List[schemas.OrderEvent] = []
+
+        for order_id, order in zip(order_ids, orders):
+            rows.append(
+                {
+                    "id": order_id,
+                    "is_hidden": False,
+                    "customer_id": customer.id,
+                    "description": order.description,
+                    "driver_id": driver_ids.get(order.driver.phone)
+                    if order.driver is not None
+                    else None,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                    "status": schemas.Status.CREATED,
+                    "latitude": order.latitude,
+                    "longtitude": order.longtitude,
+                    "address_id": address_ids[
+                        (order.address, order.region, order.city)
+                    ],
+                    "need_evacuator": order.need_evacuator,
+                    "need_field_technician": order.need_field_technician,
+                }
+            )
+            events.append(
+                schemas.OrderEvent(
+                    event=core_schemas.OutboxEventName.ORDER_CREATED,
+                    order_id=order_id,
+                    order_number=models.make_order_number(
+                        id=order_id, created_at=created_at
+                    ),
+                    status=schemas.Status.CREATED,
+                    updated_at=created_at,
+                    region=order.region,
+                    city=order.city,
+                    customer_id=customer.id,
+                )
+            )
+
+        insert_rows(db=db, model=models.Order, rows=rows)
+
+        TransportService(db=db).create_orders_transports(
+            transports_by_order_id={
+                order_id: order.transports for order_id, order in zip(order_ids, orders)
+            }
+        )
+
+        add_orders_created_events(db=db, events=events, notify_masters=notify_masters)
+
+        db.commit()
+
+        return [
+            schemas.OrderCreated(order_number=event.order_number, order_id=event.order_id)
+            for event in events
+        ]
+
     @staticmethod
     def create_order_without_register(
-        order: schemas.PostOrder, db: Session
+        order: schemas.PostOrder, db: Session, notify_masters: bool = False
     ) -> models.Order:
         customer_contact = ContactService(db=db).get_or_create(
             contact=order.customer_contact
@@ -198,7 +307,7 @@ class OrderService:
             status=schemas.Status.CREATED,
             latitude=order.latitude,
             longtitude=order.longtitude,
-            address=ContactService(db=db).get_or_create_address(
+            address_id=ContactService(db=db).address_id(
                 address=order.address, region=order.region, city=order.city
             ),
             need_evacuator=order.need_evacuator,
@@ -212,38 +321,58 @@ class OrderService:
             transports=order.transports, order=new_order
         )
 
+        add_order_event(
+            db=db,
+            name=core_schemas.OutboxEventName.ORDER_CREATED,
+            order=new_order,
+            notify_masters=notify_masters,
+        )
+
         db.commit()
 
         return new_order
 
-    def clone(self, from_order: models.Order) -> models.Order:
-        new_order = models.Order(
-            description=from_order.description,
-            driver_id=from_order.driver_id,
-            customer_contact_id=from_order.customer_contact_id,
-            created_at=from_order.created_at,
-            updated_at=datetime.utcnow(),
-            status=schemas.Status.CREATED,
-            latitude=from_order.latitude,
-            longtitude=from_order.longtitude,
-            address_id=from_order.address_id,
-            need_evacuator=from_order.need_evacuator,
-            need_field_technician=from_order.need_field_technician,
-            master_id=from_order.master_id,
-            customer_id=from_order.customer_id,
-            clone_order_id=from_order.id,
-            chat_id=from_order.chat_id,
+    def clone(self, from_order_id: int, status: schemas.Status) -> int:
+        """Copies the order with its transports and jobs server-side, tasks aren't copied"""
+        copied_columns = [
+            models.Order.description,
+            models.Order.driver_id,
+            models.Order.customer_contact_id,
+            models.Order.created_at,
+            models.Order.latitude,
+            models.Order.longtitude,
+            models.Order.address_id,
+            models.Order.need_evacuator,
+            models.Order.need_field_technician,
+            models.Order.master_id,
+            models.Order.customer_id,
+            models.Order.chat_id,
+        ]
+        statement = (
+            insert(models.Order)
+            .from_select(
+                [column.key for column in copied_columns]
+                + ["is_hidden", "updated_at", "status", "clone_order_id"],
+                select(
+                    *copied_columns,
+                    literal(False),
+                    literal(datetime.utcnow()),
+                    literal(status, type_=models.Order.status.type),
+                    models.Order.id,
+                ).where(models.Order.id == from_order_id),
+            )
+            .returning(models.Order.id)
         )
+        cloned_order_id = self.__db.execute(statement).scalar()
 
-        self.__db.flush()
-
-        transports = from_order.get_transports()
-
-        TransportService(db=self.__db).create_transports(
-            transports=transports, order=new_order
+        self.__transport_service.copy_transports(
+            from_order_id=from_order_id, to_order_id=cloned_order_id
+        )
+        self.__transport_service.copy_jobs(
+            from_order_id=from_order_id, to_order_id=cloned_order_id
         )
 
-        return new_order
+        return cloned_order_id
 
     def order_by(self, id: int, for_update: bool = False) -> Optional[models.Order]:
         if not for_update:
@@ -253,6 +382,12 @@ class OrderService:
                 self.__db.query(models.Order).filter_by(id=id).with_for_update().first()
             )
 
+    def order_detail_by(
+        self, id: int, for_update: bool = False
+    ) -> Optional[models.Order]:
+        order_detail_query = queries.OrderDetailQuery(db=self.__db)
+        return order_detail_query(order_id=id, for_update=for_update)
+
     def order_by_id(
         self,
         id: int,
@@ -260,7 +395,7 @@ class OrderService:
         user_id: int,
         for_update: bool = False,
     ) -> Optional[schemas.Order]:
-        order = self.order_by(id=id, for_update=for_update)
+        order = self.order_detail_by(id=id, for_update=for_update)
 
         if (
             user_type == auth_schemas.UserType.MASTER
@@ -284,7 +419,7 @@ class OrderService:
         id: int,
         for_update: bool = False,
     ) -> Optional[schemas.Order]:
-        order = self.order_by(id=id, for_update=for_update)
+        order = self.order_detail_by(id=id, for_update=for_update)
 
         new_order = to_order(
             order=order, user_type=auth_schemas.UserType.CUSTOMER, db=self.__db
@@ -339,9 +474,9 @@ class OrderService:
                 detail=Error.CANCEL_ORDER_NOT_ALLOWED,
             )
 
-        cloned_order = self.clone(from_order=order)
-        cloned_order.status = schemas.Status.CANCELLED
-        self.__db.add(cloned_order)
+        cloned_order_id = self.clone(
+            from_order_id=order.id, status=schemas.Status.CANCELLED
+        )
 
         order_history = models.OrderHistory()
         order_history.order_id = order.id
@@ -350,18 +485,36 @@ class OrderService:
         order_history.master_id = order.master_id
         self.__db.add(order_history)
 
-        updates = order.get_updates_for_reset_jobs()
+        # the clone got job links without tasks, the order takes them back
+        self.__transport_service.delete_jobs(order_id=order.id)
+        self.__transport_service.copy_jobs(
+            from_order_id=cloned_order_id, to_order_id=order.id
+        )
 
-        self.__update_jobs_in_order(order=order, transports=updates)
+        master_id = order.master_id
 
         order.status = schemas.Status.CREATED
         order.updated_at = datetime.utcnow()
         order.master_id = None
         order.chat_id = None
 
+        add_order_event(
+            db=self.__db,
+            name=core_schemas.OutboxEventName.ORDER_REOPENED,
+            order=order,
+        )
+        add_order_event(
+            db=self.__db,
+            name=core_schemas.OutboxEventName.ORDER_STATUS_CHANGED,
+            order=order,
+            master_id=master_id,
+        )
+
         self.__db.commit()
 
-        return to_order(order=order, user_type=user_type, db=self.__db)
+        return to_order(
+            order=self.order_detail_by(id=order.id), user_type=user_type, db=self.__db
+        )
 
     def __update_jobs_in_order(
         self, order: models.Order, transports: List[schemas.UpdateJob]
@@ -389,9 +542,15 @@ class OrderService:
         order.status = schemas.Status.PROBLEM_DIAGNOSIS_BY_CONTRACTOR
         order.updated_at = datetime.utcnow()
 
+        add_order_event(
+            db=self.__db,
+            name=core_schemas.OutboxEventName.ORDER_STATUS_CHANGED,
+            order=order,
+        )
+
         self.__db.commit()
 
-        return order
+        return self.order_detail_by(id=order_id)
 
     def buy_slots(self, jobs: List[schemas.UpdateJob], user_id: int) -> int:
         master_service = MasterService(db=self.__db)
@@ -425,9 +584,8 @@ class OrderService:
         )
 
         self.__db.commit()
-        self.__db.refresh(order)
 
-        return order
+        return self.order_detail_by(id=order_id)
 
     def get_all_orders(
         self,
@@ -435,32 +593,26 @@ class OrderService:
         user_type: auth_schemas.UserType,
         offset: int,
         limit: int = 20,
-    ) -> List[schemas.GetTransportList]:
+        cursor: Optional[str] = None,
+    ) -> List[schemas.GetOrderList]:
         if user_type == auth_schemas.UserType.CUSTOMER:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=Error.NOT_ALLOW_OPERATION,
             )
         else:
-            master_service = MasterService(db=self.__db)
-            master: auth_models.Master = master_service.get_master_by_id(user_id)
-            master_address: core_models.Address = master.address
-
-            orders_query = (
-                self.__db.query(models.Order)
-                .join(
-                    core_models.Address,
-                    models.Order.address_id == core_models.Address.id,
-                )
-                .filter(models.Order.is_hidden == False)
-                .filter(models.Order.status == schemas.Status.CREATED)
-                .filter(core_models.Address.region == master_address.region)
-            )
-
-            db_orders: List[models.Order] = (
-                orders_query.offset(offset).limit(limit).all()
-            )
-            return utils.map_orders_models_to_orders_schemas(orders=db_orders)
+            order_list_query = queries.OrderListQuery(db=self.__db)
+            orders = order_list_query(
+                models.Order.is_hidden == False,
+                models.Order.status == schemas.Status.CREATED,
+                core_models.Address.region
+                == queries.master_region_subquery(master_id=user_id),
+                *utils.after_cursor_criteria(cursor),
+                offset=offset,
+                limit=limit,
+            ).as_schemas()
+
+            return orders
 
     def get_my_list(
         self,
@@ -468,29 +620,31 @@ class OrderService:
         user_type: auth_schemas.UserType,
         offset: int,
         limit: int = 20,
+        cursor: Optional[str] = None,
     ) -> List[schemas.GetOrderList]:
-        if user_type == auth_schemas.UserType.CUSTOMER:
-            db_orders: List[models.Order] = (
-                self.__db.query(models.Order)
-                .filter(models.Order.customer_id == user_id)
-                .filter(models.Order.status != schemas.Status.CANCELLED)
-                .filter(models.Order.is_hidden == False)
-                .offset(offset)
-                .limit(limit)
-                .all()
-            )
+        order_list_query = queries.OrderListQuery(db=self.__db)
+        after_cursor = utils.after_cursor_criteria(cursor)
 
-            return utils.map_orders_models_to_orders_schemas(orders=db_orders)
+        if user_type == auth_schemas.UserType.CUSTOMER:
+            orders = order_list_query(
+                models.Order.customer_id == user_id,
+                models.Order.status != schemas.Status.CANCELLED,
+                models.Order.is_hidden == False,
+                *after_cursor,
+                offset=offset,
+                limit=limit,
+            ).as_schemas()
+
+            return orders
         elif user_type == auth_schemas.UserType.MASTER:
-            db_orders: List[models.Order] = (
-                self.__db.query(models.Order)
-                .filter_by(master_id=user_id)
-                .filter(models.Order.is_hidden == False)
-                .offset(offset)
-                .limit(limit)
-                .all()
-            )
-
-            return utils.map_orders_models_to_orders_schemas(orders=db_orders)
+            orders = order_list_query(
+                models.Order.master_id == user_id,
+                models.Order.is_hidden == False,
+                *after_cursor,
+                offset=offset,
+                limit=limit,
+            ).as_schemas()
+
+            return orders
 
         return []
@@ -0,0 +1,184 @@
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+import httpx
+
+from redis import Redis
+
+from app.config import settings
+from app.redis_client import get_redis
+
+
+class RateLimiter(ABC):
+    @abstractmethod
+    def reserve(self) -> float:
+        """Takes a token and returns how long to wait before it may be used"""
+
+    def acquire(self) -> None:
+        if delay := self.reserve():
+            time.sleep(delay)
+
+
+class TokenBucket(RateLimiter):
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.__rate = rate
+        self.__capacity = capacity
+        self.__tokens = capacity
+        self.__updated_at = time.monotonic()
+        self.__lock = Lock()
+
+    def reserve(self) -> float:
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(
+                self.__capacity,
+                self.__tokens + (now - self.__updated_at) * self.__rate,
+            )
+            self.__updated_at = now
+            self.__tokens -= 1
+
+            if self.__tokens >= 0:
+                return 0
+            else:
+                return -self.__tokens / self.__rate
+
+
+# the bucket state lives in redis, time is taken from the redis server so
+# reservations of all processes are made against the same clock
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate) - 1
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], 60)
+if tokens >= 0 then
+    return "0"
+end
+return tostring(-tokens / rate)
+"""
+
+
+class RedisTokenBucket(RateLimiter):
+    """Token bucket shared by every process, e.g. all children of a prefork worker"""
+
+    def __init__(self, redis: Redis, key: str, rate: float, capacity: float) -> None:
+        self.__key = key
+        self.__rate = rate
+        self.__capacity = capacity
+        self.__reserve = redis.register_script(RESERVE_SCRIPT)
+
+    def reserve(self) -> float:
+        return float(
+            self.__reserve(keys=[self.__key], args=[self.__rate, self.__capacity])
+        )
+
+
+class TelegramRateLimited(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Telegram asked to retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TelegramSender:
+    """Sends bot messages over one pooled connection within Telegram limits.
+
+    Telegram allows about 30 messages per second per bot and one message per
+    second per chat, both are enforced with token buckets before each request.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        api_url: str,
+        messages_per_second: float,
+        chat_messages_per_second: float = 1,
+        max_chats: int = 10_000,
+        bucket: Optional[RateLimiter] = None,
+    ) -> None:
+        self.__url = f"{api_url}/bot{token}/sendMessage"
+        self.__client = httpx.Client(
+            timeout=httpx.Timeout(10),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+        )
+        # no burst on top of the rate, a full bucket would let through twice
+        # the limit within the first second
+        self.__bucket = bucket or TokenBucket(rate=messages_per_second, capacity=1)
+        self.__chat_rate = chat_messages_per_second
+        self.__chat_buckets: OrderedDict[int, TokenBucket] = OrderedDict()
+        self.__max_chats = max_chats
+        self.__lock = Lock()
+
+    def send_message(self, chat_id: int, text: str) -> None:
+        self.__chat_bucket(chat_id).acquire()
+        self.__bucket.acquire()
+
+        response = self.__client.post(
+            self.__url,
+            data={
+                "chat_id": chat_id,
+                "text": text,
+                "disable_web_page_preview": True,
+            },
+        )
+
+        if response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+            parameters = response.json().get("parameters", {})
+            raise TelegramRateLimited(retry_after=parameters.get("retry_after", 1))
+
+        assert response.status_code == 200, "TG should return 200"
+
+    def __chat_bucket(self, chat_id: int) -> TokenBucket:
+        with self.__lock:
+            bucket = self.__chat_buckets.get(chat_id)
+
+            if bucket is None:
+                bucket = TokenBucket(rate=self.__chat_rate, capacity=1)
+                self.__chat_buckets[chat_id] = bucket
+
+                while len(self.__chat_buckets) > self.__max_chats:
+                    self.__chat_buckets.popitem(last=False)
+            else:
+                self.__chat_buckets.move_to_end(chat_id)
+
+            return bucket
+
+
+_sender: Optional[TelegramSender] = None
+_sender_lock = Lock()
+
+
+def get_telegram_sender() -> TelegramSender:
+    """Sender of the current worker process, created lazily after fork"""
+    global _sender
+
+    with _sender_lock:
+        if _sender is None:
+            bucket: Optional[RateLimiter] = None
+
+            # the bot limit is global, prefork children and several send
+            # workers have to share one bucket
+            if settings.REDIS_URL is not None:
+                bucket = RedisTokenBucket(
+                    redis=get_redis(),
+                    key=f"telegram:bucket:{settings.TELEGRAM_BOT_TOKEN.split(':')[0]}",
+                    rate=settings.TELEGRAM_MESSAGES_PER_SECOND,
+                    capacity=1,
+                )
+
+            _sender = TelegramSender(
+                token=settings.TELEGRAM_BOT_TOKEN,
+                api_url=settings.TELEGRAM_API_URL,
+                messages_per_second=settings.TELEGRAM_MESSAGES_PER_SECOND,
+                bucket=bucket,
+            )
+
+        return _sender
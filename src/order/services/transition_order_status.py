@@ -12,9 +12,12 @@ import auth.schemas as auth_schemas
 from auth.services.master_service import MasterService
 
 from core.errors import Error
+from core.schemas import OutboxEventName
 
 from chat.services import ChatService
 
+from order.services.order_events import add_order_event
+
 
 class TrasitionOrderStatus:
     def __init__(self, db: Session, order: models.Order) -> None:
@@ -36,6 +39,10 @@ class TrasitionOrderStatus:
                         master_id=order.master_id, customer_id=order.customer_id
                     )
                     order.chat_id = chat.id
+
+                add_order_event(
+                    db=self.__db, name=OutboxEventName.ORDER_TAKEN, order=order
+                )
             else:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -85,6 +92,10 @@ class TrasitionOrderStatus:
 
         self.make_history(status=status)
 
+        add_order_event(
+            db=self.__db, name=OutboxEventName.ORDER_STATUS_CHANGED, order=order
+        )
+
     def make_history(self, status: schemas.Status) -> None:
         order_history = models.OrderHistory()
         order_history.order_id = self.__order.id
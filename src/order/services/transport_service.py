@@ -1,5 +1,7 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 import order.schemas as schemas
@@ -7,9 +9,44 @@ import order.models as models
 
 from fastapi import HTTPException, status
 
+from app.database import insert_rows, keys_in
+
+from core.cache import ReferenceIdsCache
 from core.errors import Error
 
 
+# brand, model, type, trailer_type
+TransportKey = Tuple[str, Optional[str], str, Optional[str]]
+
+# transport_id, job_id, task_id
+JobLinkKey = Tuple[int, int, Optional[int]]
+
+transport_ids_cache: ReferenceIdsCache[TransportKey] = ReferenceIdsCache("transport")
+job_ids_cache: ReferenceIdsCache[int] = ReferenceIdsCache("job")
+task_ids_cache: ReferenceIdsCache[str] = ReferenceIdsCache("task")
+
+
+def transport_key(transport: schemas.Transport) -> TransportKey:
+    return (transport.brand, transport.model, transport.type, transport.trailer_type)
+
+
+def diff_job_links(
+    existing: Iterable[Tuple[int, JobLinkKey]], requested: Set[JobLinkKey]
+) -> Tuple[List[int], Set[JobLinkKey]]:
+    """Ids of stored links to delete and keys of links to insert"""
+    kept: Set[JobLinkKey] = set()
+    removed_ids: List[int] = []
+
+    for id, key in existing:
+        # duplicates are possible, NULL tasks don't collide in the unique index
+        if key in requested and key not in kept:
+            kept.add(key)
+        else:
+            removed_ids.append(id)
+
+    return removed_ids, requested - kept
+
+
 class TransportService:
     def __init__(self, db: Session) -> None:
         self.__db = db
@@ -17,19 +54,92 @@ class TransportService:
     def create_transports(
         self, transports: List[schemas.Transport], order: models.Order
     ):
-        transport_service = TransportService(db=self.__db)
+        """Links transports and their jobs to the flushed order in bulk"""
+        self.create_orders_transports(transports_by_order_id={order.id: transports})
 
-        for transport in transports:
-            link = transport_service.__create_transport_link(transport)
-            link.order = order
-            if link.id is None:
-                self.__db.add(link)
-                self.__db.flush()
-                transport_service.__create_job_links(
-                    jobs=transport.jobs,
-                    order_id=order.id,
-                    transport_id=link.transport_id,
+    def create_orders_transports(
+        self, transports_by_order_id: Dict[int, List[schemas.Transport]]
+    ):
+        all_transports = [
+            transport
+            for transports in transports_by_order_id.values()
+            for transport in transports
+        ]
+
+        if len(all_transports) == 0:
+            return
+
+        transport_ids = self.__transport_ids(
+            keys=[transport_key(transport) for transport in all_transports]
+        )
+        job_ids = self.__job_ids(
+            category_ids=[job.category_id for t in all_transports for job in t.jobs]
+        )
+
+        transport_links = []
+        job_links = []
+
+        for order_id, transports in transports_by_order_id.items():
+            for transport in transports:
+                transport_id = transport_ids[transport_key(transport)]
+                transport_links.append(
+                    {
+                        "order_id": order_id,
+                        "transport_id": transport_id,
+                        "license_number": transport.license_number,
+                        "vin": transport.vin,
+                        "mileage": transport.mileage,
+                    }
+                )
+                for job in transport.jobs:
+                    job_links.append(
+                        {
+                            "order_id": order_id,
+                            "transport_id": transport_id,
+                            "job_id": job_ids[job.category_id],
+                        }
+                    )
+
+        insert_rows(db=self.__db, model=models.TransportLink, rows=transport_links)
+        insert_rows(db=self.__db, model=models.JobLink, rows=job_links)
+
+    def copy_transports(self, from_order_id: int, to_order_id: int):
+        columns = [
+            models.TransportLink.transport_id,
+            models.TransportLink.license_number,
+            models.TransportLink.vin,
+            models.TransportLink.mileage,
+        ]
+        self.__db.execute(
+            insert(models.TransportLink).from_select(
+                ["order_id"] + [column.key for column in columns],
+                select(literal(to_order_id), *columns).where(
+                    models.TransportLink.order_id == from_order_id
+                ),
+            )
+        )
+
+    def copy_jobs(self, from_order_id: int, to_order_id: int):
+        """Copies job links without tasks, one per transport and job"""
+        self.__db.execute(
+            insert(models.JobLink).from_select(
+                ["order_id", "transport_id", "job_id"],
+                select(
+                    literal(to_order_id),
+                    models.JobLink.transport_id,
+                    models.JobLink.job_id,
                 )
+                .where(models.JobLink.order_id == from_order_id)
+                .distinct(),
+            )
+        )
+
+    def delete_jobs(self, order_id: int):
+        self.__db.execute(
+            delete(models.JobLink)
+            .where(models.JobLink.order_id == order_id)
+            .execution_options(synchronize_session=False)
+        )
 
     def setExtraValues(
         self,
@@ -67,109 +177,184 @@ class TransportService:
         self.__db.commit()
 
     def update_jobs_in(self, transports: List[schemas.UpdateJob], order_id: int):
+        """Applies only the difference between stored and requested job links"""
+        if len(transports) == 0:
+            return
+
+        jobs = [job for transport in transports for job in transport.jobs]
+        job_ids = self.__job_ids(category_ids=[job.category_id for job in jobs])
+        task_ids = self.__task_ids(tasks=[task for job in jobs for task in job.tasks])
+
+        requested: Set[JobLinkKey] = set()
+
         for transport in transports:
-            self.__prepare_to_update_jobs(
-                order_id=order_id, transport_id=transport.transport_id
-            )
             for job in transport.jobs:
-                db_job = self.__get_or_create_job(job=job)
-                self.__db.flush()
+                job_id = job_ids[job.category_id]
                 if len(job.tasks) == 0:
-                    link = models.JobLink(
-                        order_id=order_id,
-                        job=db_job,
-                        transport_id=transport.transport_id,
-                    )
-                    self.__db.add(link)
+                    requested.add((transport.transport_id, job_id, None))
                 else:
                     for task in job.tasks:
-                        db_task = self.__get_or_create_task(task=task)
-                        link = models.JobLink(
-                            order_id=order_id,
-                            job=db_job,
-                            task=db_task,
-                            transport_id=transport.transport_id,
+                        requested.add(
+                            (transport.transport_id, job_id, task_ids[task.name])
                         )
-                        self.__db.add(link)
-
-    def __get_or_create_transport(
-        self, transport: schemas.Transport
-    ) -> Optional[models.Transport]:
-        db_transport = (
-            self.__db.query(models.Transport)
-            .filter_by(
-                model=transport.model,
-                brand=transport.brand,
-                type=transport.type,
-                trailer_type=transport.trailer_type,
+
+        existing = self.__db.execute(
+            select(
+                models.JobLink.id,
+                models.JobLink.transport_id,
+                models.JobLink.job_id,
+                models.JobLink.task_id,
+            ).where(
+                models.JobLink.order_id == order_id,
+                models.JobLink.transport_id.in_(
+                    {transport.transport_id for transport in transports}
+                ),
             )
-            .first()
+        ).all()
+
+        removed_ids, added = diff_job_links(
+            existing=[
+                (id, (transport_id, job_id, task_id))
+                for id, transport_id, job_id, task_id in existing
+            ],
+            requested=requested,
         )
 
-        if db_transport is None:
-            db_transport = models.Transport()
-            db_transport.brand = transport.brand
-            db_transport.model = transport.model
-            db_transport.type = transport.type
-            db_transport.trailer_type = transport.trailer_type
+        if len(removed_ids) > 0:
+            self.__db.execute(
+                delete(models.JobLink).where(models.JobLink.id.in_(removed_ids))
+            )
+
+        insert_rows(
+            db=self.__db,
+            model=models.JobLink,
+            rows=[
+                {
+                    "order_id": order_id,
+                    "transport_id": transport_id,
+                    "job_id": job_id,
+                    "task_id": task_id,
+                }
+                for transport_id, job_id, task_id in added
+            ],
+        )
 
-        return db_transport
+    def __transport_ids(
+        self, keys: Iterable[TransportKey]
+    ) -> Dict[TransportKey, int]:
+        return transport_ids_cache.get_or_load(
+            db=self.__db, keys=keys, load=self.__load_transport_ids
+        )
 
-    def __create_transport_link(
-        self, transport: schemas.Transport
-    ) -> models.TransportLink:
-        transport_link = models.TransportLink()
-        transport_link.transport = self.__get_or_create_transport(transport)
+    def __load_transport_ids(
+        self, keys: Set[TransportKey]
+    ) -> Dict[TransportKey, int]:
+        columns = (
+            models.Transport.brand,
+            models.Transport.model,
+            models.Transport.type,
+            models.Transport.trailer_type,
+        )
+        # model and trailer_type are nullable, plain equality misses NULL rows
+        query = select(*columns, models.Transport.id).where(
+            keys_in(columns=columns, keys=list(keys))
+        )
 
-        if transport.license_number is not None:
-            transport_link.license_number = transport.license_number
+        ids = self.__transport_ids_from(query)
+        missing = sorted(keys - ids.keys(), key=str)
 
-        if transport.vin is not None:
-            transport_link.vin = transport.vin
+        if len(missing) > 0:
+            statement = (
+                insert(models.Transport)
+                .values(
+                    [
+                        {
+                            "brand": brand,
+                            "model": model,
+                            "type": type,
+                            "trailer_type": trailer_type,
+                        }
+                        for brand, model, type, trailer_type in missing
+                    ]
+                )
+                .on_conflict_do_nothing()
+                .returning(*columns, models.Transport.id)
+            )
+            ids.update(self.__transport_ids_from(statement))
 
-        if transport.mileage is not None:
-            transport_link.mileage = transport.mileage
+            if len(ids) < len(keys):
+                # inserted by a concurrent transaction
+                ids.update(self.__transport_ids_from(query))
 
-        return transport_link
+        return ids
 
-    def __get_or_create_job(self, job: schemas.Job) -> models.Job:
-        db_job = (
-            self.__db.query(models.Job)
-            .filter(models.Job.category_id == job.category_id)
-            .first()
+    def __transport_ids_from(self, statement) -> Dict[TransportKey, int]:
+        return {
+            (brand, model, type, trailer_type): id
+            for brand, model, type, trailer_type, id in self.__db.execute(statement)
+        }
+
+    def __job_ids(self, category_ids: Iterable[int]) -> Dict[int, int]:
+        return job_ids_cache.get_or_load(
+            db=self.__db, keys=category_ids, load=self.__load_job_ids
         )
 
-        if db_job is None:
-            return models.Job(category_id=job.category_id)
-        else:
-            return db_job
+    def __load_job_ids(self, category_ids: Set[int]) -> Dict[int, int]:
+        query = select(models.Job.category_id, models.Job.id).where(
+            models.Job.category_id.in_(category_ids)
+        )
+
+        ids = dict(self.__db.execute(query).all())
+        missing = sorted(category_ids - ids.keys())
+
+        if len(missing) > 0:
+            statement = (
+                insert(models.Job)
+                .values([{"category_id": category_id} for category_id in missing])
+                .on_conflict_do_nothing(index_elements=[models.Job.category_id])
+                .returning(models.Job.category_id, models.Job.id)
+            )
+            ids.update(self.__db.execute(statement).all())
+
+            if len(ids) < len(category_ids):
+                # inserted by a concurrent transaction
+                ids.update(self.__db.execute(query).all())
+
+        return ids
 
-    def __get_or_create_task(self, task: schemas.Task) -> models.Task:
-        db_task = (
-            self.__db.query(models.Task).filter(models.Task.name == task.name).first()
+    def __task_ids(self, tasks: Iterable[schemas.Task]) -> Dict[str, int]:
+        # an existing task keeps its agreed flag, like before
+        agreed_by_name = {task.name: task.agreed for task in tasks}
+
+        return task_ids_cache.get_or_load(
+            db=self.__db,
+            keys=agreed_by_name.keys(),
+            load=lambda names: self.__load_task_ids(
+                agreed_by_name={name: agreed_by_name[name] for name in names}
+            ),
         )
 
-        if db_task is None:
-            return models.Task(name=task.name, agreed=task.agreed)
-        else:
-            return db_task
-
-    def __create_job_links(
-        self, jobs: List[schemas.Job], order_id: int, transport_id: int
-    ) -> models.TransportLink:
-        for job in jobs:
-            job_link: models.JobLink = models.JobLink()
-            job_link.order_id = order_id
-            job_link.transport_id = transport_id
-            job_link.job = self.__get_or_create_job(job=job)
-            self.__db.add(job_link)
-
-    def __prepare_to_update_jobs(self, order_id: int, transport_id):
-        db_links = (
-            self.__db.query(models.JobLink)
-            .filter_by(order_id=order_id, transport_id=transport_id)
-            .all()
+    def __load_task_ids(self, agreed_by_name: Dict[str, bool]) -> Dict[str, int]:
+        query = select(models.Task.name, models.Task.id).where(
+            models.Task.name.in_(agreed_by_name.keys())
         )
 
-        for db_link in db_links:
-            self.__db.delete(db_link)
+        ids = dict(self.__db.execute(query).all())
+        missing = sorted(agreed_by_name.keys() - ids.keys())
+
+        if len(missing) > 0:
+            statement = (
+                insert(models.Task)
+                .values(
+                    [{"name": name, "agreed": agreed_by_name[name]} for name in missing]
+                )
+                .on_conflict_do_nothing(index_elements=[models.Task.name])
+                .returning(models.Task.name, models.Task.id)
+            )
+            ids.update(self.__db.execute(statement).all())
+
+            if len(ids) < len(agreed_by_name):
+                # inserted by a concurrent transaction
+                ids.update(self.__db.execute(query).all())
+
+        return ids
@@ -1,32 +1,203 @@
-import httpx
+import json
+import logging
+
+from typing import List, Optional
 
 from app.celery import celery
 from app.config import settings
+from app.redis_client import get_redis
 from app.database import SessionLocal
 
+from core.models import OutboxEvent
+from core.schemas import OutboxEventName
+from core.services.outbox_service import OutboxService
+
 from order.services.new_order_notifier import NewOrderNotifier
+from order.services.order_events import ORDER_EVENTS_CHANNEL
+from order.services.notification_digest import NotificationDigest
+from order.services.telegram_sender import TelegramRateLimited, get_telegram_sender
+
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(bind=True, max_retries=5)
+def tg_new_order_notify(self, chat_id: int, message: str):
+    try:
+        get_telegram_sender().send_message(chat_id=chat_id, text=message)
+    except TelegramRateLimited as error:
+        raise self.retry(countdown=error.retry_after)
+
+
+@celery.task(bind=True, max_retries=5)
+def tg_new_order_notify_chats(self, chat_ids: List[int], message: str):
+    sender = get_telegram_sender()
+
+    for index, chat_id in enumerate(chat_ids):
+        try:
+            sender.send_message(chat_id=chat_id, text=message)
+        except TelegramRateLimited as error:
+            # resend only to chats which did not get the message yet
+            raise self.retry(
+                kwargs={"chat_ids": chat_ids[index:], "message": message},
+                countdown=error.retry_after,
+            )
+        except Exception:
+            # e.g. the master blocked the bot, the other chats still get it
+            logger.exception("Telegram message to chat %s failed", chat_id)
 
 
 @celery.task
-def tg_new_order_notify(chat_id: int, message: str):
-    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-    response = httpx.post(
-        url,
-        data={
-            "chat_id": chat_id,
-            "text": message,
-            "disable_web_page_preview": True,
-        },
+def tg_flush_digests(chat_ids: List[int]):
+    digest = NotificationDigest(
+        redis=get_redis(), window=settings.TG_DIGEST_WINDOW_SECONDS
     )
 
-    assert response.status_code == 200, "TG should return 200"
+    for chat_id in chat_ids:
+        notifications = digest.pop(chat_id=chat_id)
 
+        if len(notifications) > 0:
+            tg_new_order_notify.delay(
+                chat_id=chat_id, message=NewOrderNotifier.render_digest(notifications)
+            )
 
-@celery.task
-def schedule_tg_order_new_notify(order_id: int):
+
+# The outbox event stays locked while its fan-out is dispatched and is marked
+# consumed in the same transaction. A second delivery of the event waits for
+# the lock and skips it, a failed dispatch is retried.
+@celery.task(bind=True, max_retries=5, default_retry_delay=5)
+def schedule_tg_order_new_notify(self, order_id: int, event_id: Optional[int] = None):
+    db = SessionLocal()
+    outbox_service = OutboxService(db=db)
+    try:
+        if event_id is not None and not outbox_service.lock_unconsumed(event_id):
+            return
+
+        NewOrderNotifier(db=db).notify(order_id=order_id)
+
+        if event_id is not None:
+            outbox_service.mark_consumed([event_id])
+
+        db.commit()
+    except Exception as error:
+        db.rollback()
+        raise self.retry(exc=error)
+    finally:
+        db.close()
+
+
+@celery.task(bind=True, max_retries=5, default_retry_delay=5)
+def schedule_tg_orders_new_notify(self, order_ids: List[int], event_id: int):
     db = SessionLocal()
+    outbox_service = OutboxService(db=db)
     new_order = NewOrderNotifier(db=db)
     try:
-        new_order.notify(order_id=order_id)
+        if not outbox_service.lock_unconsumed(event_id):
+            return
+
+        for order_id in order_ids:
+            # one broken order must not cost the rest of the batch its notification
+            try:
+                with db.begin_nested():
+                    new_order.notify(order_id=order_id)
+            except Exception:
+                logger.exception("New order notification failed, order %s", order_id)
+
+        outbox_service.mark_consumed([event_id])
+        db.commit()
+    except Exception as error:
+        db.rollback()
+        raise self.retry(exc=error)
+    finally:
+        db.close()
+
+
+@celery.task
+def purge_outbox_events():
+    db = SessionLocal()
+    try:
+        OutboxService(db=db).purge()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _schedule_consumer(event: OutboxEvent) -> bool:
+    """Hands the event to its consumer task, False when it has none"""
+    if event.name == OutboxEventName.ORDERS_CREATED:
+        schedule_tg_orders_new_notify.delay(
+            order_ids=event.payload["order_ids"], event_id=event.id
+        )
+        return True
+
+    if event.name == OutboxEventName.ORDER_CREATED and event.payload.get(
+        "notify_masters", True
+    ):
+        schedule_tg_order_new_notify.delay(
+            order_id=event.payload["order_id"], event_id=event.id
+        )
+        return True
+
+    return False
+
+
+@celery.task
+def redeliver_outbox_events(batch_size: int = 100):
+    db = SessionLocal()
+    outbox_service = OutboxService(db=db)
+    try:
+        abandoned_ids = outbox_service.abandon_stale()
+
+        # only the consumer gets the event again, the live feeds saw it already
+        events = outbox_service.lock_stale(limit=batch_size)
+        redelivered_ids = [event.id for event in events]
+
+        for event in events:
+            _schedule_consumer(event)
+
+        # restarts the redelivery timeout
+        outbox_service.mark_published(events)
+        db.commit()
+    except:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if len(abandoned_ids) > 0:
+        logger.error("Outbox events were never consumed, gave up: %s", abandoned_ids)
+
+    if len(redelivered_ids) > 0:
+        logger.warning(
+            "Outbox events were not consumed, redelivering: %s", redelivered_ids
+        )
+
+
+@celery.task
+def relay_outbox_events(batch_size: int = 100):
+    db = SessionLocal()
+    outbox_service = OutboxService(db=db)
+    try:
+        events = outbox_service.lock_unpublished(limit=batch_size)
+        # events nobody consumes are done once published
+        handled_ids: List[int] = []
+
+        for event in events:
+            if not _schedule_consumer(event):
+                handled_ids.append(event.id)
+
+            # live order feeds of the api workers, a batch has no single payload
+            if (
+                settings.REDIS_URL is not None
+                and event.name != OutboxEventName.ORDERS_CREATED
+            ):
+                get_redis().publish(ORDER_EVENTS_CHANNEL, json.dumps(event.payload))
+
+        outbox_service.mark_published(events)
+        outbox_service.mark_consumed(handled_ids)
+        db.commit()
+    except:
+        db.rollback()
+        raise
     finally:
         db.close()
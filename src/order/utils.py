@@ -1,40 +1,48 @@
+import base64
+import binascii
+import json
+
+from datetime import datetime
 from typing import List, Optional
 
+from fastapi import HTTPException, status
+
+from sqlalchemy import tuple_
+from sqlalchemy.sql.expression import ColumnElement
+
 import order.schemas as schemas
 import order.models as models
 
-import auth.schemas as auth_schemas
+from core.errors import Error
 
 
-def map_transports_to_short_transport(
-    transports: List[schemas.Transport],
-) -> List[schemas.GetTransportList]:
-    short_transports: List[schemas.GetTransportList] = []
+def encode_cursor(order: schemas.GetOrderList) -> str:
+    payload = json.dumps([order.update_at.isoformat(), order.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
 
-    for transport in transports:
-        short_transports.append(schemas.GetTransportList(**transport.model_dump()))
 
-    return short_transports
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        update_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(update_at), int(id)
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=Error.INVALID_CURSOR,
+        )
 
 
-def map_orders_models_to_orders_schemas(
-    orders: List[models.Order],
-) -> List[schemas.GetOrderList]:
-    new_orders: List[schemas.GetOrderList] = []
+def next_cursor(orders: List[schemas.GetOrderList], limit: int) -> Optional[str]:
+    if len(orders) < limit or len(orders) == 0:
+        return None
+
+    return encode_cursor(orders[-1])
 
-    for order in orders:
-        transports: List[schemas.Transport] = order.get_transports()
-        list_order = schemas.GetOrderList(
-            id=order.id,
-            status=order.status,
-            order_number=order.order_number,
-            transports=map_transports_to_short_transport(transports),
-            update_at=order.updated_at,
-            region=order.address.region,
-            city=order.address.city,
-        )
-        new_orders.append(list_order)
 
-    new_orders.sort(key=lambda x: x.update_at, reverse=True)
+def after_cursor_criteria(cursor: Optional[str]) -> List[ColumnElement]:
+    """Keyset condition for lists ordered by (updated_at, id) descending"""
+    if cursor is None:
+        return []
 
-    return new_orders
+    update_at, id = decode_cursor(cursor)
+    return [tuple_(models.Order.updated_at, models.Order.id) < tuple_(update_at, id)]
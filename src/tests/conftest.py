@@ -0,0 +1,20 @@
+import os
+
+
+# settings are read on import, the tested code needs no real services
+for key, value in {
+    "JWT_PUBLIC_KEY": "test",
+    "JWT_PRIVATE_KEY": "test",
+    "REFRESH_TOKEN_EXPIRES_IN": "60",
+    "ACCESS_TOKEN_EXPIRES_IN": "15",
+    "SENTRY_DSN": "",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_NAME": "test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "TELEGRAM_BOT_TOKEN": "1:test",
+    "CLIENT_ORIGIN": "http://localhost",
+    "CELERY_BROKER_URL": "redis://localhost",
+}.items():
+    os.environ.setdefault(key, value)
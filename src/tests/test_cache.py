@@ -0,0 +1,76 @@
+import pytest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from core.cache import PENDING_IDS_KEY, ReferenceIdsCache
+
+
+class Loader:
+    def __init__(self, ids):
+        self.ids = ids
+        self.calls = []
+
+    def __call__(self, keys):
+        self.calls.append(set(keys))
+        return {key: self.ids[key] for key in keys}
+
+
+@pytest.fixture
+def db():
+    # any database fires the session transaction events
+    session = Session(bind=create_engine("sqlite://"))
+    session.execute(text("select 1"))
+    yield session
+    session.close()
+
+
+def test_ids_are_promoted_on_commit(db):
+    cache = ReferenceIdsCache("test")
+    load = Loader({"a": 1, "b": 2})
+
+    assert cache.get_or_load(db=db, keys=["a", "b"], load=load) == {"a": 1, "b": 2}
+    db.commit()
+
+    assert cache.get_or_load(db=db, keys=["a", "b"], load=load) == {"a": 1, "b": 2}
+    assert load.calls == [{"a", "b"}]
+    assert PENDING_IDS_KEY not in db.info
+
+
+def test_ids_are_discarded_on_rollback(db):
+    cache = ReferenceIdsCache("test")
+    load = Loader({"a": 1})
+
+    cache.get_or_load(db=db, keys=["a"], load=load)
+    db.rollback()
+
+    cache.get_or_load(db=db, keys=["a"], load=load)
+
+    assert load.calls == [{"a"}, {"a"}]
+    assert PENDING_IDS_KEY in db.info
+
+
+def test_only_missing_keys_are_loaded(db):
+    cache = ReferenceIdsCache("test")
+    cache.put({"a": 1})
+    load = Loader({"b": 2})
+
+    assert cache.get_or_load(db=db, keys=["a", "b"], load=load) == {"a": 1, "b": 2}
+    assert load.calls == [{"b"}]
+
+
+def test_least_recently_used_ids_are_evicted(db):
+    cache = ReferenceIdsCache("test", max_size=2)
+    cache.put({"a": 1, "b": 2})
+    # "a" becomes the most recently used
+    cache.get_or_load(db=db, keys=["a"], load=Loader({}))
+    cache.put({"c": 3})
+
+    load = Loader({"b": 2})
+
+    assert cache.get_or_load(db=db, keys=["a", "b", "c"], load=load) == {
+        "a": 1,
+        "b": 2,
+        "c": 3,
+    }
+    assert load.calls == [{"b"}]
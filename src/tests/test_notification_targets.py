@@ -0,0 +1,113 @@
+import math
+import random
+
+import pytest
+
+from auth.services.notification_targets import (
+    GRID_CELL_DEGREES,
+    RADIUS_EARTH_KM,
+    MastersGeoIndex,
+)
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * RADIUS_EARTH_KM * math.asin(math.sqrt(min(a, 1)))
+
+
+def brute_force(masters, latitude: float, longtitude: float):
+    return sorted(
+        chat_id
+        for chat_id, lat, lon, radius in masters
+        if haversine(lat, lon, latitude, longtitude) <= radius
+    )
+
+
+def random_masters(rng: random.Random, count: int):
+    return [
+        (
+            chat_id,
+            rng.uniform(41, 70),
+            rng.uniform(20, 180),
+            rng.choice([0, 10, 50, 100, 300, 1000]),
+        )
+        for chat_id in range(count)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_covering_matches_brute_force(seed):
+    rng = random.Random(seed)
+    masters = random_masters(rng, count=500)
+    index = MastersGeoIndex(masters=masters)
+
+    for _ in range(200):
+        latitude, longtitude = rng.uniform(41, 70), rng.uniform(20, 180)
+
+        assert sorted(index.covering(latitude, longtitude)) == brute_force(
+            masters, latitude, longtitude
+        )
+
+
+def test_covering_near_cell_edges():
+    rng = random.Random(1)
+    masters = random_masters(rng, count=300)
+    index = MastersGeoIndex(masters=masters)
+
+    for _ in range(200):
+        # points just either side of a grid line
+        latitude = round(rng.uniform(41, 70) / GRID_CELL_DEGREES) * GRID_CELL_DEGREES
+        longtitude = round(rng.uniform(20, 180) / GRID_CELL_DEGREES) * GRID_CELL_DEGREES
+
+        for shift in (-1e-9, 0, 1e-9):
+            point = (latitude + shift, longtitude - shift)
+
+            assert sorted(index.covering(*point)) == brute_force(masters, *point)
+
+
+def test_covering_at_radius_edge():
+    # points straight north of a master, just inside and just outside its radius
+    master = (1, 55.75, 37.61, 100.0)
+    index = MastersGeoIndex(masters=[master])
+    degrees = math.degrees(100.0 / RADIUS_EARTH_KM)
+
+    assert index.covering(55.75 + degrees * 0.999, 37.61) == [1]
+    assert index.covering(55.75 + degrees * 1.001, 37.61) == []
+
+
+def test_covering_master_in_a_far_cell():
+    # the largest radius widens the search to cells far from the point
+    masters = [(1, 50.0, 30.0, 1000.0), (2, 60.0, 60.0, 5.0)]
+    index = MastersGeoIndex(masters=masters)
+
+    assert index.covering(55.0, 40.0) == brute_force(masters, 55.0, 40.0) == [1]
+
+
+def test_covering_across_the_antimeridian():
+    masters = [(1, 66.0, 179.8, 50.0), (2, 66.0, -179.8, 50.0)]
+    index = MastersGeoIndex(masters=masters)
+
+    assert sorted(index.covering(66.0, -179.9)) == [1, 2]
+    assert sorted(index.covering(66.0, 179.9)) == [1, 2]
+
+
+def test_covering_with_a_radius_around_the_pole():
+    rng = random.Random(2)
+    masters = random_masters(rng, count=100) + [(1000, 80.0, 100.0, 2500.0)]
+    index = MastersGeoIndex(masters=masters)
+
+    for latitude, longtitude in [(85.0, -80.0), (70.0, 100.0), (60.0, 30.0)]:
+        assert sorted(index.covering(latitude, longtitude)) == brute_force(
+            masters, latitude, longtitude
+        )
+
+
+def test_covering_without_masters():
+    index = MastersGeoIndex(masters=[])
+
+    assert index.chat_ids == frozenset()
+    assert index.covering(55.75, 37.61) == []
@@ -0,0 +1,46 @@
+import base64
+
+from datetime import datetime
+
+import pytest
+
+from fastapi import HTTPException
+
+from core.errors import Error
+
+import order.schemas as schemas
+
+from order.utils import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    order = schemas.GetOrderList(
+        id=42,
+        status=schemas.Status.CREATED,
+        order_number="42",
+        transports=[],
+        update_at=datetime(2023, 9, 1, 12, 30, 15, 123456),
+        region="Москва",
+    )
+
+    assert decode_cursor(encode_cursor(order)) == (order.update_at, 42)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not base64!",
+        base64.urlsafe_b64encode(b"not json").decode(),
+        base64.urlsafe_b64encode(b'{"id": 1}').decode(),
+        base64.urlsafe_b64encode(b'["yesterday", 1]').decode(),
+        base64.urlsafe_b64encode(b'["2023-09-01T12:30:15", "one"]').decode(),
+        base64.urlsafe_b64encode(b'["2023-09-01T12:30:15", 1, 2]').decode(),
+    ],
+)
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == Error.INVALID_CURSOR
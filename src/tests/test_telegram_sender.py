@@ -0,0 +1,71 @@
+import pytest
+
+import order.services.telegram_sender as telegram_sender
+
+from order.services.telegram_sender import TokenBucket
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(telegram_sender.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(telegram_sender.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_up_to_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_reservations_queue_up(clock):
+    bucket = TokenBucket(rate=10, capacity=1)
+    bucket.reserve()
+
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.1, 0.2, 0.3])
+
+
+def test_refills_with_time(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock.now += 0.1
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_refill_is_capped_by_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    clock.now += 60
+
+    assert [bucket.reserve() for _ in range(2)] == [0, 0]
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_acquire_keeps_the_rate(clock):
+    bucket = TokenBucket(rate=30, capacity=1)
+    started_at = clock.now
+
+    for _ in range(90):
+        bucket.acquire()
+
+    # the first message goes at once, the rest one per 1/30 s
+    assert clock.now - started_at == pytest.approx(89 / 30)
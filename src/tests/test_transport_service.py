@@ -0,0 +1,39 @@
+from order.services.transport_service import diff_job_links
+
+
+def test_diff_keeps_adds_and_removes():
+    existing = [
+        (1, (10, 100, None)),
+        (2, (10, 101, 1000)),
+        (3, (11, 100, None)),
+    ]
+    requested = {(10, 100, None), (10, 101, 1001), (12, 100, None)}
+
+    removed_ids, added = diff_job_links(existing=existing, requested=requested)
+
+    assert removed_ids == [2, 3]
+    assert added == {(10, 101, 1001), (12, 100, None)}
+
+
+def test_diff_removes_duplicates():
+    # NULL tasks don't collide in the unique index, a link may be stored twice
+    existing = [(1, (10, 100, None)), (2, (10, 100, None))]
+
+    removed_ids, added = diff_job_links(
+        existing=existing, requested={(10, 100, None)}
+    )
+
+    assert removed_ids == [2]
+    assert added == set()
+
+
+def test_diff_without_stored_links():
+    requested = {(10, 100, None), (10, 101, 1000)}
+
+    assert diff_job_links(existing=[], requested=requested) == ([], requested)
+
+
+def test_diff_without_requested_links():
+    existing = [(1, (10, 100, None)), (2, (10, 101, 1000))]
+
+    assert diff_job_links(existing=existing, requested=set()) == ([1, 2], set())